@@ -0,0 +1,261 @@
+"""
+Benchmark tools for the chatbot backend.
+
+Usage:
+    python benchmark.py cpu [--repeat 3] [--batch-size 32]
+    python benchmark.py models [--models multilingual-minilm-l12 all-minilm-l6] [--labelled queries.jsonl] [--update]
+    python benchmark.py payload [--repeat 20]
+"""
+import argparse
+import gc
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+import server
+
+
+def candidate_thread_counts(cores):
+    """Powers of two up to the core count, plus the core count itself"""
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    counts.append(cores)
+    return counts
+
+
+def time_encode(chatbot, texts, batch_size, repeat):
+    """Return (p50 single-query latency in ms, batch throughput in sentences/s)"""
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            chatbot.encode([text])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chatbot.encode(texts, batch_size=batch_size)
+    throughput = len(texts) * repeat / (time.perf_counter() - start)
+
+    return float(np.percentile(latencies, 50)), throughput
+
+
+def benchmark_cpu(args):
+    """Measure encoder latency/throughput per intra-op thread count and recommend defaults"""
+    import torch
+
+    chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, use_lightweight_model=True)
+    if chatbot.model is None:
+        print("Model not available, nothing to benchmark")
+        return
+
+    texts = chatbot.processed_questions
+    cores = server.available_cores()
+    print(f"Detected cores: {cores}, FAQ questions: {len(texts)}")
+    print(f"{'threads':>8} {'p50 ms':>10} {'sent/s':>10}")
+
+    results = {}
+    for threads in candidate_thread_counts(cores):
+        torch.set_num_threads(threads)
+        chatbot.encode(texts[:4])  # warm up the resized pool
+        p50, throughput = time_encode(chatbot, texts, args.batch_size, args.repeat)
+        results[threads] = (p50, throughput)
+        print(f"{threads:>8} {p50:>10.2f} {throughput:>10.1f}")
+
+    # Single worker: lowest latency. Multiple workers: each gets cores // workers threads,
+    # so pick the split that maximizes estimated node throughput.
+    best_latency = min(results, key=lambda t: results[t][0])
+    best_split = max(results, key=lambda t: (cores // t) * results[t][1])
+    workers = max(1, cores // best_split)
+
+    print()
+    print("Recommended single-worker settings:")
+    print(f"  CHATBOT_INTRA_OP_THREADS={best_latency} CHATBOT_INTER_OP_THREADS=1")
+    print("Recommended multi-worker settings:")
+    print(f"  CHATBOT_WORKERS={workers} CHATBOT_INTRA_OP_THREADS={best_split} CHATBOT_INTER_OP_THREADS=1")
+    print(f"  pin each worker to {best_split} core(s) with CHATBOT_CPU_AFFINITY, e.g. 0-{best_split - 1}")
+
+
+def faq_queries(chatbot):
+    """Labelled queries from the FAQ itself: each question with its first word dropped"""
+    queries, labels = [], []
+    for i, question in enumerate(chatbot.processed_questions):
+        words = question.split()
+        queries.append(' '.join(words[1:]) if len(words) > 2 else question)
+        labels.append(i)
+    return queries, np.array(labels)
+
+
+def labelled_queries(chatbot, path):
+    """Queries and expected rows (-1 = should not be answered) from a calibration-style file"""
+    from calibrate_thresholds import load_labelled
+
+    queries, labels = [], []
+    for item in load_labelled(path):
+        processed = chatbot.normalize_query(item.get("query", ""))
+        expected = item.get("expected")
+        label = -1 if expected is None else chatbot.fast_path.get(chatbot.preprocess_text(expected))
+        if processed and label is not None:
+            queries.append(processed)
+            labels.append(label)
+    return queries, np.array(labels)
+
+
+def model_memory_mb(model):
+    """Size of the model parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+
+
+def benchmark_models(args):
+    """Compare registered encoder profiles on FAQ retrieval accuracy, latency and memory"""
+    from calibrate_thresholds import evaluate
+
+    registry = server.load_model_registry(server.MODEL_REGISTRY_FILE)
+    profiles = args.models or list(registry["models"])
+    # Raw model scores only; calibrated thresholds belong to one model
+    server.THRESHOLDS_FILE = ''
+
+    print(f"{'profile':<26} {'dim':>4} {'MB':>6} {'load s':>7} {'p50 ms':>7} {'sent/s':>8} "
+          f"{'top1':>6} {'prec':>6} {'recall':>6}")
+    results = {}
+    for profile in profiles:
+        server.MODEL_PROFILE = profile
+        start = time.perf_counter()
+        chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, use_lightweight_model=True)
+        load_seconds = time.perf_counter() - start
+        if chatbot.model is None or chatbot.model_profile != profile:
+            print(f"{profile:<26} not available in {server.MODEL_CACHE_DIR}, skipped")
+            continue
+
+        if args.labelled:
+            queries, labels = labelled_queries(chatbot, args.labelled)
+        else:
+            queries, labels = faq_queries(chatbot)
+        embeddings = chatbot.encode(queries, batch_size=args.batch_size)
+        similarities = embeddings @ chatbot.question_embeddings.T
+        predicted = similarities.argmax(axis=1)
+        scores = similarities[np.arange(len(queries)), predicted]
+        in_scope = labels >= 0
+        correct = predicted == labels
+        accuracy = evaluate(scores, correct, in_scope, np.full(len(queries), chatbot.threshold))
+
+        p50, throughput = time_encode(chatbot, chatbot.processed_questions, args.batch_size, args.repeat)
+        spec = registry["models"][profile]
+        results[profile] = {
+            "dimension": spec["dimension"],
+            "memory_mb": round(model_memory_mb(chatbot.model), 1),
+            "load_seconds": round(load_seconds, 2),
+            "latency_ms": round(p50, 2),
+            "throughput": round(throughput, 1),
+            "top1": round(float(correct[in_scope].mean()), 4) if in_scope.any() else 0.0,
+            "threshold": chatbot.threshold,
+            **accuracy
+        }
+        r = results[profile]
+        print(f"{profile:<26} {r['dimension']:>4} {r['memory_mb']:>6.0f} {r['load_seconds']:>7.1f} "
+              f"{r['latency_ms']:>7.2f} {r['throughput']:>8.1f} {r['top1']:>6.3f} "
+              f"{r['precision']:>6.3f} {r['recall']:>6.3f}")
+
+        del chatbot, embeddings, similarities
+        gc.collect()
+
+    source = args.labelled or "FAQ questions without their first word"
+    print(f"\nQueries: {source}; precision/recall at each profile's registry threshold")
+
+    if args.update and results:
+        for profile, r in results.items():
+            registry["models"][profile]["latency_ms"] = r["latency_ms"]
+            registry["models"][profile]["memory_mb"] = round(r["memory_mb"])
+        with open(server.MODEL_REGISTRY_FILE, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Measured latency/memory written to {server.MODEL_REGISTRY_FILE}")
+
+
+def benchmark_payload(args):
+    """Compare per-request JSON building with pre-serialized payloads, and bytes on the wire per encoding"""
+    from flask import jsonify
+
+    chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, use_lightweight_model=True)
+    server.chatbot = chatbot
+    server.chatbot_status = {"ready": True, "error": None}
+    # Every request comes from the same test client; measure answers, not 429 bodies
+    server.rate_limiter = None
+    rows = list(zip(chatbot.df['jawaban'], chatbot.df['kategori']))
+    session_id = "0" * 32
+
+    def dynamic_fields():
+        return {"confidence": 0.873, "response_time": 0.012, "session_id": session_id}
+
+    with server.app.test_request_context():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for answer, category in rows:
+                jsonify({"status": "success", "message": answer, "category": category, **dynamic_fields(),
+                         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}).get_data()
+        per_dict = (time.perf_counter() - start) * 1e6 / (args.repeat * len(rows))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for answer, category in rows:
+                chatbot.answer_payload(answer, category) + server.dumps_bytes(
+                    {**dynamic_fields(), "timestamp": server.current_timestamp()})[1:]
+        per_payload = (time.perf_counter() - start) * 1e6 / (args.repeat * len(rows))
+
+    encoder = "orjson" if server.orjson is not None else "json"
+    print(f"Serialization per response: jsonify {per_dict:.1f} us, pre-serialized + {encoder} {per_payload:.1f} us "
+          f"({per_dict / per_payload:.1f}x)")
+
+    # End to end through the Flask app; FAQ questions hit the fast path so the encoder is not involved
+    client = server.app.test_client()
+    encodings = ['identity', 'gzip'] + (['br'] if server.brotli is not None else [])
+    print(f"\n{'Accept-Encoding':<16} {'avg bytes':>10} {'max bytes':>10} {'compressed':>11} {'p50 ms':>8}")
+    for encoding in encodings:
+        sizes, latencies, compressed = [], [], 0
+        for question in chatbot.df['pertanyaan']:
+            start = time.perf_counter()
+            response = client.post('/api/chat', json={"message": question, "session_id": session_id},
+                                   headers={"Accept-Encoding": encoding})
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(response.data))
+            compressed += 'Content-Encoding' in response.headers
+        print(f"{encoding:<16} {np.mean(sizes):>10.0f} {max(sizes):>10} {compressed:>11} "
+              f"{np.percentile(latencies, 50):>8.2f}")
+    print(f"\nResponses of at least {server.COMPRESS_MIN_BYTES} bytes are compressed (CHATBOT_COMPRESS_MIN_BYTES)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot UPA TIK benchmarks")
+    parser.add_argument('--dataset', default=None, help="Path to dataset.json (default: built-in FAQ)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    cpu_parser = subparsers.add_parser('cpu', help="Benchmark torch CPU thread settings")
+    cpu_parser.add_argument('--repeat', type=int, default=3)
+    cpu_parser.add_argument('--batch-size', type=int, default=32)
+    cpu_parser.set_defaults(func=benchmark_cpu)
+
+    models_parser = subparsers.add_parser('models', help="Compare registered encoder models")
+    models_parser.add_argument('--models', nargs='+', help="Profiles to compare (default: all registered)")
+    models_parser.add_argument('--labelled', help="Labelled query set as used by calibrate_thresholds.py")
+    models_parser.add_argument('--repeat', type=int, default=3)
+    models_parser.add_argument('--batch-size', type=int, default=32)
+    models_parser.add_argument('--update', action='store_true',
+                               help="Write measured latency and memory back into the registry")
+    models_parser.set_defaults(func=benchmark_models)
+
+    payload_parser = subparsers.add_parser('payload', help="Measure response serialization and compression")
+    payload_parser.add_argument('--repeat', type=int, default=20)
+    payload_parser.set_defaults(func=benchmark_payload)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
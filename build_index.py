@@ -0,0 +1,164 @@
+"""
+Build the question embedding index outside the server.
+
+The normalized FAQ questions are split into fixed-size shards and encoded
+by a pool of worker processes, each with its own copy of the model and a
+share of the cores. Finished shards are checkpointed to the work directory,
+so an interrupted build only re-encodes the shards that are missing. The
+shards are then merged into the artifact the server loads at startup
+(CHATBOT_INDEX_FILE, default index.npz) instead of encoding the dataset itself.
+
+Usage:
+    python build_index.py --dataset dataset.json --workers 4 --batch-size 256
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import server
+
+_model = None
+
+
+def init_worker(spec, threads):
+    """Load the model once per worker process, with threads intra-op threads"""
+    global _model
+    import torch
+
+    torch.set_num_threads(threads)
+    _model = server.load_sentence_model(spec, 'cpu')
+
+
+def encode_shard(task):
+    """Encode one shard and write it atomically; returns (shard, rows, seconds)"""
+    import torch
+
+    shard, texts, path, batch_size = task
+    start = time.perf_counter()
+    with torch.inference_mode():
+        embeddings = _model.encode(texts, batch_size=batch_size, convert_to_tensor=False,
+                                   normalize_embeddings=True, show_progress_bar=False)
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, np.asarray(embeddings, dtype=np.float32))
+    os.replace(tmp_path, path)
+    return shard, len(texts), time.perf_counter() - start
+
+
+def shard_path(work_dir, shard):
+    return os.path.join(work_dir, f"shard-{shard:05d}.npy")
+
+
+def is_build_file(name):
+    """Files this tool writes into the work directory"""
+    return name == 'manifest.json' or (name.startswith('shard-') and name.endswith('.npy'))
+
+
+def prepare_work_dir(work_dir, manifest, force):
+    """Reuse checkpoints only when they were made for the same texts, model and shard size"""
+    manifest_path = os.path.join(work_dir, 'manifest.json')
+    if os.path.isdir(work_dir):
+        names = os.listdir(work_dir)
+        foreign = [name for name in names if not is_build_file(name)]
+        if foreign:
+            # Never clear a directory this tool did not create (--work-dir . or a data directory)
+            raise SystemExit(f"{work_dir} contains files not written by build_index.py "
+                             f"({', '.join(sorted(foreign)[:3])}...); choose an empty or dedicated --work-dir")
+        if os.path.exists(manifest_path) and not force:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                if json.load(f) == manifest:
+                    return
+            print(f"Checkpoints in {work_dir} belong to another build, starting over")
+        for name in names:
+            os.remove(os.path.join(work_dir, name))
+    else:
+        os.makedirs(work_dir)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def finished_shards(work_dir, shards, dimension):
+    """Shards whose checkpoint exists with the expected shape"""
+    done = set()
+    for shard, texts in enumerate(shards):
+        path = shard_path(work_dir, shard)
+        if not os.path.exists(path):
+            continue
+        try:
+            if np.load(path, mmap_mode='r').shape == (len(texts), dimension):
+                done.add(shard)
+        except (OSError, ValueError):
+            pass  # partial file from an interrupted write, encode it again
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the question embedding index in parallel shards")
+    parser.add_argument('--dataset', default="dataset.json" if os.path.exists("dataset.json") else None)
+    parser.add_argument('--model', default=None, help="Model profile (default: CHATBOT_MODEL or the registry default)")
+    parser.add_argument('--workers', type=int, default=0, help="Encoder processes (default: one per 2 cores)")
+    parser.add_argument('--threads', type=int, default=0, help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument('--shard-size', type=int, default=4096)
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--work-dir', default='index_build', help="Checkpoint directory for finished shards")
+    parser.add_argument('--output', default=server.INDEX_FILE or 'index.npz')
+    parser.add_argument('--force', action='store_true', help="Discard existing checkpoints")
+    args = parser.parse_args()
+
+    # Same dataset loading, ordering and normalization as the server
+    chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, load_model=False)
+    profile = args.model or chatbot.model_profile
+    if profile not in chatbot.model_registry["models"]:
+        raise SystemExit(f"Unknown model profile {profile!r}; registered: {', '.join(chatbot.model_registry['models'])}")
+    spec = chatbot.model_registry["models"][profile]
+    texts = chatbot.processed_questions
+    shards = [texts[i:i + args.shard_size] for i in range(0, len(texts), args.shard_size)]
+
+    cores = server.available_cores()
+    workers = args.workers or max(1, min(len(shards), cores // 2))
+    threads = args.threads or max(1, cores // workers)
+
+    manifest = {
+        "model": profile,
+        "rows": len(texts),
+        "dimension": spec["dimension"],
+        "digest": server.texts_digest(texts),
+        "shard_size": args.shard_size
+    }
+    prepare_work_dir(args.work_dir, manifest, args.force)
+    done = finished_shards(args.work_dir, shards, spec["dimension"])
+    pending = [s for s in range(len(shards)) if s not in done]
+    print(f"{len(texts)} questions in {len(shards)} shards, {len(done)} already checkpointed; "
+          f"model {profile}, {workers} workers x {threads} threads")
+
+    if pending:
+        tasks = [(s, shards[s], shard_path(args.work_dir, s), args.batch_size) for s in pending]
+        encoded, encode_seconds = 0, 0.0
+        total = sum(len(shards[s]) for s in pending)
+        start = time.perf_counter()
+        # spawn: every worker gets a clean torch runtime with its own thread pool
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers, initializer=init_worker, initargs=(spec, threads)) as pool:
+            for shard, rows, seconds in pool.imap_unordered(encode_shard, tasks):
+                encoded += rows
+                encode_seconds += seconds
+                elapsed = time.perf_counter() - start
+                print(f"  shard {shard:>5}: {rows} rows in {seconds:.1f}s "
+                      f"({encoded}/{total} rows, {encoded / elapsed:.1f} sent/s)")
+        elapsed = time.perf_counter() - start
+        # Wall time includes spawning workers and loading the model; encode time is what scales with the corpus
+        print(f"Encoded {encoded} sentences in {elapsed:.1f}s: {encoded / elapsed:.1f} sentences/s overall, "
+              f"{encoded / encode_seconds * min(workers, len(pending)):.1f} sentences/s while encoding")
+
+    embeddings = np.concatenate([np.load(shard_path(args.work_dir, s)) for s in range(len(shards))])
+    tmp_output = args.output + '.tmp.npz'
+    np.savez(tmp_output, embeddings=embeddings, meta=json.dumps(manifest))
+    os.replace(tmp_output, args.output)
+    print(f"Index written to {args.output}: {embeddings.shape[0]} x {embeddings.shape[1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Calibrate similarity thresholds per FAQ entry and per category.
+
+Takes a labelled query set, scores every query against the FAQ index in one
+matrix product and, for each group (global, category, entry), picks the
+threshold on a grid that maximizes F-beta. The result is written to
+thresholds.json, which the server resolves into one threshold per row at
+startup.
+
+Labelled set: JSON list or JSONL of {"query": "...", "expected": "<FAQ question>"},
+with "expected": null for queries the bot should not answer.
+
+Usage:
+    python calibrate_thresholds.py labelled_queries.jsonl --output thresholds.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import server
+
+
+def load_labelled(path):
+    """Read the labelled query set (JSON list or JSON lines)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def fbeta_scores(tp, fp, positives, beta):
+    """F-beta per group and threshold from (G, T) true/false positive counts"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(positives[:, None] > 0, tp / positives[:, None], 0.0)
+        b2 = beta * beta
+        return np.where(precision + recall > 0, (1 + b2) * precision * recall / (b2 * precision + recall), 0.0)
+
+
+def calibrate_groups(groups, n_groups, label_groups, scores, correct, grid, beta, min_support):
+    """Best threshold per group (NaN when the group has too little data)"""
+    accept = scores[:, None] >= grid[None, :]
+    tp = np.zeros((n_groups, len(grid)))
+    fp = np.zeros((n_groups, len(grid)))
+    np.add.at(tp, groups, accept & correct[:, None])
+    np.add.at(fp, groups, accept & ~correct[:, None])
+
+    positives = np.bincount(label_groups[label_groups >= 0], minlength=n_groups).astype(float)
+    support = np.bincount(groups, minlength=n_groups)
+
+    best = grid[np.argmax(fbeta_scores(tp, fp, positives, beta), axis=1)]
+
+    # Groups that only ever attract wrong matches (no labelled positives, or positives that were all
+    # matched elsewhere): F-beta is 0 everywhere, so take the lowest threshold that rejects them all
+    no_hits = tp[:, 0] == 0  # the lowest threshold accepts the most
+    if no_hits.any():
+        rejects_all = fp[no_hits] == 0
+        first = np.where(rejects_all.any(axis=1), rejects_all.argmax(axis=1), len(grid) - 1)
+        best[no_hits] = grid[first]
+
+    best[support < min_support] = np.nan
+    return best
+
+
+def evaluate(scores, correct, in_scope, thresholds):
+    """Precision / recall / F1 when each query is accepted at its own threshold"""
+    accepted = scores >= thresholds
+    tp = int((accepted & correct).sum())
+    fp = int((accepted & ~correct).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / int(in_scope.sum()) if in_scope.any() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4),
+            "accepted": int(accepted.sum())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate per-entry and per-category thresholds")
+    parser.add_argument('labelled', help="Labelled query set (JSON or JSONL)")
+    parser.add_argument('--dataset', default="dataset.json" if os.path.exists("dataset.json") else None)
+    parser.add_argument('--output', default=server.THRESHOLDS_FILE or 'thresholds.json')
+    parser.add_argument('--beta', type=float, default=0.5, help="F-beta weight; < 1 favours precision")
+    parser.add_argument('--min-support', type=int, default=5,
+                        help="Minimum matched queries before a group gets its own threshold")
+    parser.add_argument('--grid-min', type=float, default=0.3)
+    parser.add_argument('--grid-max', type=float, default=0.95)
+    parser.add_argument('--grid-step', type=float, default=0.01)
+    args = parser.parse_args()
+
+    # Calibrate against the raw model scores, not a previously calibrated file
+    server.THRESHOLDS_FILE = ''
+    chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, use_lightweight_model=True)
+    if chatbot.model is None or chatbot.question_embeddings is None:
+        raise SystemExit("Model not available, cannot calibrate")
+
+    queries, labels = [], []
+    for item in load_labelled(args.labelled):
+        processed = chatbot.normalize_query(item.get("query", ""))
+        if not processed:
+            continue
+        expected = item.get("expected")
+        if expected is None:
+            label = -1
+        else:
+            label = chatbot.fast_path.get(chatbot.preprocess_text(expected))
+            if label is None:
+                print(f"Skipping query with unknown expected FAQ: {expected!r}")
+                continue
+        queries.append(processed)
+        labels.append(label)
+
+    labels = np.array(labels)
+    print(f"Scoring {len(queries)} labelled queries ({int((labels >= 0).sum())} in scope)")
+
+    # One matrix product for the whole set; embeddings are normalized so dot = cosine
+    query_embeddings = chatbot.encode(queries, batch_size=128)
+    similarities = query_embeddings @ chatbot.question_embeddings.T
+    predicted = similarities.argmax(axis=1)
+    scores = similarities[np.arange(len(queries)), predicted]
+    correct = predicted == labels
+    in_scope = labels >= 0
+
+    grid = np.round(np.arange(args.grid_min, args.grid_max + 1e-9, args.grid_step), 4)
+    category_names = list(chatbot.partitions)
+    row_category = np.empty(len(chatbot.df), dtype=np.int64)
+    for c, rows in enumerate(chatbot.partitions.values()):
+        row_category[rows] = c
+
+    global_threshold = calibrate_groups(np.zeros(len(queries), dtype=np.int64), 1,
+                                        np.where(in_scope, 0, -1), scores, correct, grid, args.beta, 1)[0]
+    category_thresholds = calibrate_groups(row_category[predicted], len(category_names),
+                                           np.where(in_scope, row_category[np.maximum(labels, 0)], -1),
+                                           scores, correct, grid, args.beta, args.min_support)
+    entry_thresholds = calibrate_groups(predicted, len(chatbot.df), labels,
+                                        scores, correct, grid, args.beta, args.min_support)
+
+    # Same resolution order as the server: entry, then category, then global
+    row_thresholds = np.where(np.isnan(category_thresholds[row_category]), global_threshold,
+                              category_thresholds[row_category])
+    row_thresholds = np.where(np.isnan(entry_thresholds), row_thresholds, entry_thresholds)
+
+    report = {
+        "baseline": evaluate(scores, correct, in_scope, np.full(len(queries), chatbot.threshold)),
+        "global": evaluate(scores, correct, in_scope, np.full(len(queries), global_threshold)),
+        "calibrated": evaluate(scores, correct, in_scope, row_thresholds[predicted])
+    }
+
+    result = {
+        "generated_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "model": chatbot.model_profile,
+        "labelled_queries": len(queries),
+        "beta": args.beta,
+        "global": float(global_threshold),
+        "categories": {
+            name: float(t) for name, t in zip(category_names, category_thresholds) if not np.isnan(t)
+        },
+        "entries": {
+            chatbot.preprocess_text(chatbot.df.iloc[i]['pertanyaan']): float(t)
+            for i, t in enumerate(entry_thresholds) if not np.isnan(t)
+        },
+        "report": report
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{'':<34} {'precision':>9} {'recall':>7} {'f1':>7}")
+    for name, label in (("baseline", f"baseline ({chatbot.threshold})"),
+                        ("global", f"global ({global_threshold:.2f})"),
+                        ("calibrated", f"calibrated ({len(result['categories'])} cat, "
+                                       f"{len(result['entries'])} entries)")):
+        r = report[name]
+        print(f"{label:<34} {r['precision']:>9.3f} {r['recall']:>7.3f} {r['f1']:>7.3f}")
+    print(f"Thresholds written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Dedicated encoder process shared by all HTTP workers.
+
+One (or N) encoder processes own the sentence transformer; HTTP workers send
+preprocessed text over a Unix socket and get normalized embeddings back.
+Requests arriving from different workers within a short window are encoded
+in one batch.
+
+Usage:
+    python encoder_server.py --socket /tmp/chatbot-encoder.sock
+    CHATBOT_ENCODER_SOCKETS=/tmp/chatbot-encoder.sock gunicorn -w 4 'server:create_app()'
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_FRAME_HEADER = struct.Struct('!I')
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Encoder socket closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def send_frame(sock, payload):
+    """Send a length-prefixed frame"""
+    sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """Receive a length-prefixed frame"""
+    (size,) = _FRAME_HEADER.unpack(_recv_exact(sock, _FRAME_HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class EncodeBatcher:
+    """Collects encode requests from all connections and runs them as one batch"""
+
+    def __init__(self, encode_fn, max_batch=64, max_wait=0.005):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+        worker = threading.Thread(target=self._run, daemon=True)
+        worker.start()
+
+    def submit(self, texts):
+        """Block until the embeddings for texts are ready"""
+        job = {"texts": texts, "done": threading.Event(), "result": None, "error": None}
+        self.pending.put(job)
+        job["done"].wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return job["result"]
+
+    def _run(self):
+        while True:
+            jobs = [self.pending.get()]
+            size = len(jobs[0]["texts"])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                size += len(job["texts"])
+
+            texts = [t for job in jobs for t in job["texts"]]
+            try:
+                embeddings = self.encode_fn(texts)
+                offset = 0
+                for job in jobs:
+                    job["result"] = embeddings[offset:offset + len(job["texts"])]
+                    offset += len(job["texts"])
+            except Exception as e:
+                logger.error(f"Batch encode failed: {e}")
+                for job in jobs:
+                    job["error"] = e
+
+            self.stats["requests"] += len(jobs)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            for job in jobs:
+                job["done"].set()
+
+
+class _EncodeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                request = json.loads(recv_frame(self.request))
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                if request.get("op") == "info":
+                    send_frame(self.request, json.dumps({
+                        "dim": self.server.dim,
+                        "model": self.server.model_profile,
+                        "stats": batcher.stats
+                    }).encode())
+                    continue
+
+                embeddings = np.ascontiguousarray(batcher.submit(request["texts"]), dtype=np.float32)
+                header = {"rows": embeddings.shape[0], "dim": embeddings.shape[1]}
+                send_frame(self.request, json.dumps(header).encode())
+                send_frame(self.request, embeddings.tobytes())
+            except Exception as e:
+                send_frame(self.request, json.dumps({"error": str(e)}).encode())
+
+
+class EncoderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every HTTP worker thread keeps its own connection
+    request_queue_size = 128
+
+    def __init__(self, socket_path, encode_fn, dim, max_batch=64, max_wait=0.005, model_profile=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _EncodeHandler)
+        self.dim = dim
+        self.model_profile = model_profile
+        self.batcher = EncodeBatcher(encode_fn, max_batch, max_wait)
+
+
+class RemoteEncoder:
+    """Client side stand-in for SentenceTransformer.encode, backed by encoder processes"""
+
+    def __init__(self, socket_paths, timeout=30.0):
+        self.socket_paths = list(socket_paths)
+        self.timeout = timeout
+        self._next_path = itertools.cycle(self.socket_paths)
+        self._path_lock = threading.Lock()
+        self._local = threading.local()
+        info = self._call({"op": "info"})
+        self.dim = info["dim"]
+        self.model_profile = info.get("model")
+
+    def _connect(self):
+        with self._path_lock:
+            path = next(self._next_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(path)
+        self._local.sock = sock
+        return sock
+
+    def _call(self, request, expect_payload=False):
+        payload = json.dumps(request).encode()
+        # Retry once on a fresh connection (encoder restarted, stale socket)
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            try:
+                if sock is None:
+                    sock = self._connect()
+                send_frame(sock, payload)
+                header = json.loads(recv_frame(sock))
+                if "error" in header:
+                    raise RuntimeError(f"Encoder server error: {header['error']}")
+                if not expect_payload:
+                    return header
+                data = recv_frame(sock)
+                return np.frombuffer(data, dtype=np.float32).reshape(header["rows"], header["dim"])
+            except (ConnectionError, OSError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt == 1:
+                    raise
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        """Embeddings are always normalized numpy arrays; batching happens server side"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self._call({"texts": list(texts)}, expect_payload=True)
+
+    def stats(self):
+        return self._call({"op": "info"})["stats"]
+
+
+def serve(socket_path, use_lightweight_model=True, max_batch=64, max_wait_ms=5.0):
+    """Load the model with the regular chatbot setup and serve it on socket_path"""
+    import server
+
+    # Reuse the chatbot's model loading, CPU runtime config and encoder optimization
+    encoder = server.ChatbotUPATIK(use_lightweight_model=use_lightweight_model, encoder_sockets=[])
+    if encoder.model is None:
+        raise SystemExit("Encoder model could not be loaded")
+
+    dim = encoder.model.get_sentence_embedding_dimension()
+    encoder_server = EncoderServer(socket_path, encoder.encode, dim, max_batch, max_wait_ms / 1000,
+                                   model_profile=encoder.model_profile)
+    logger.info(f"Encoder server listening on {socket_path} "
+                f"(model={encoder.model_profile}, dim={dim}, max_batch={max_batch})")
+    try:
+        encoder_server.serve_forever()
+    finally:
+        encoder_server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared encoder process for Chatbot UPA TIK")
+    parser.add_argument('--socket', default='/tmp/chatbot-encoder.sock')
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Number of encoder processes; sockets are suffixed with .0, .1, ...")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--full-model', action='store_true', help="Use the registry's default profile instead of the lightweight one")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.processes <= 1:
+        serve(args.socket, not args.full_model, args.max_batch, args.max_wait_ms)
+        return
+
+    paths = [f"{args.socket}.{i}" for i in range(args.processes)]
+    # Split the cores between encoder processes unless told otherwise
+    os.environ.setdefault('CHATBOT_WORKERS', str(args.processes))
+    logger.info(f"Starting {args.processes} encoder processes, set CHATBOT_ENCODER_SOCKETS={','.join(paths)}")
+    processes = [
+        multiprocessing.Process(target=serve, args=(path, not args.full_model, args.max_batch, args.max_wait_ms))
+        for path in paths
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ $(document).ready(function() {
     // Config
     const USE_MOCK_API = false; // Set ke true untuk demonstrasi tanpa backend
     const API_URL = 'http://localhost:5000/api'; // URL Flask API
+    const USE_STREAMING = true; // Jawaban diterima bertahap lewat /api/chat/stream (server-sent events)
     
     // Avatar constants
     const USER_AVATAR = '<i class="fas fa-user"></i>';
@@ -34,6 +35,7 @@ $(document).ready(function() {
     let chatHistory = [];
     let lastMessageTime = null;
     let messageIdCounter = 0;
+    let sessionId = null; // Diisi dari respons server, agar pertanyaan lanjutan punya konteks
     
     // Initialize
     initializeChatbot();
@@ -146,7 +148,8 @@ $(document).ready(function() {
         quickReplyItems.click(function() {
             const question = $(this).text();
             userInput.val(question);
-            sendUserMessage();
+            // Kategori (jika ada) dikirim sebagai hint agar pencarian hanya di partisi tersebut
+            sendUserMessage($(this).data('category') || null);
         });
         
         // FAQ questions - menggunakan event delegation untuk dynamic content
@@ -199,7 +202,7 @@ $(document).ready(function() {
         });
     }
     
-    function sendUserMessage() {
+    function sendUserMessage(categoryHint = null) {
         const message = userInput.val().trim();
         
         if (message === '' || isTyping) {
@@ -225,23 +228,38 @@ $(document).ready(function() {
             }, 1000 + Math.random() * 2000);
         } else {
             // Send to real API
-            sendToAPI(message);
+            sendToAPI(message, categoryHint);
         }
     }
     
-    function sendToAPI(message) {
+    function sendToAPI(message, categoryHint = null) {
+        const payload = { message: message };
+        if (sessionId) {
+            payload.session_id = sessionId;
+        }
+        if (categoryHint) {
+            payload.category = categoryHint;
+        }
+        
+        if (USE_STREAMING && window.fetch && window.ReadableStream && window.TextDecoder) {
+            sendToStreamAPI(payload);
+            return;
+        }
+        
         $.ajax({
             url: `${API_URL}/chat`,
             type: 'POST',
             contentType: 'application/json',
-            data: JSON.stringify({
-                message: message
-            }),
+            data: JSON.stringify(payload),
             timeout: 10000,
             success: function(response) {
                 console.log('API Response:', response);
                 hideTypingIndicator();
                 
+                if (response.session_id) {
+                    sessionId = response.session_id;
+                }
+                
                 if (response.status === 'success') {
                     addMessage(
                         response.message, 
@@ -273,6 +291,102 @@ $(document).ready(function() {
         });
     }
     
+    function sendToStreamAPI(payload) {
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), 10000);
+        let botMessage = null; // Entri chatHistory yang sedang diisi chunk
+        let textElement = null;
+        
+        function handleEvent(raw) {
+            let type = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) {
+                    type = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            });
+            const event = data ? JSON.parse(data) : {};
+            
+            if (type === 'meta') {
+                // Metadata datang segera setelah pencarian, sebelum teks jawaban
+                hideTypingIndicator();
+                if (event.session_id) {
+                    sessionId = event.session_id;
+                }
+                const messageId = addMessage('', 'bot', event.category, event.confidence, {
+                    responseTime: event.response_time,
+                    timestamp: event.timestamp
+                });
+                botMessage = chatHistory[chatHistory.length - 1];
+                textElement = chatMessages.find(`[data-message-id="${messageId}"] .message-text`);
+            } else if (type === 'chunk' && botMessage) {
+                botMessage.content += event.text;
+                textElement.html(botMessage.content);
+                scrollToBottom();
+            }
+        }
+        
+        fetch(`${API_URL}/chat/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload),
+            signal: controller.signal
+        })
+        .then(response => {
+            if (!response.ok) {
+                const error = new Error(`HTTP ${response.status}`);
+                error.status = response.status;
+                throw error;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) {
+                        return;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        handleEvent(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                    }
+                    return read();
+                });
+            }
+            return read();
+        })
+        .then(() => {
+            clearTimeout(timer);
+            if (!botMessage) {
+                hideTypingIndicator();
+                addMessage('Maaf, terjadi kesalahan. Silakan coba lagi.', 'bot', 'Error', 0);
+            }
+        })
+        .catch(error => {
+            clearTimeout(timer);
+            console.error('API Error:', error);
+            hideTypingIndicator();
+            if (botMessage) {
+                return; // Sebagian jawaban sudah tampil
+            }
+            
+            let errorMessage = 'Maaf, tidak dapat terhubung ke server.';
+            if (error.name === 'AbortError') {
+                errorMessage = 'Koneksi timeout. Silakan coba lagi.';
+            } else if (error.status === 503) {
+                errorMessage = 'Server sedang tidak tersedia. Silakan coba lagi nanti.';
+            }
+            
+            addMessage(errorMessage, 'bot', 'Error', 0);
+        });
+    }
+    
     function addMessage(content, sender, category = '', confidence = 0, metadata = {}) {
         const messageId = ++messageIdCounter;
         const timestamp = new Date();
@@ -338,6 +452,8 @@ $(document).ready(function() {
         setTimeout(() => {
             userInput.focus();
         }, 100);
+        
+        return messageId;
     }
     
     function showTypingIndicator() {
@@ -497,6 +613,7 @@ $(document).ready(function() {
         if (confirm('Yakin ingin menghapus semua percakapan?')) {
             chatMessages.empty();
             chatHistory = [];
+            sessionId = null; // Percakapan baru, konteks lama tidak dipakai lagi
             
             // Re-add date separator
             const today = new Date();
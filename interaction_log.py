@@ -0,0 +1,112 @@
+"""
+Append-only interaction log.
+
+Request threads only enqueue records; a background writer thread batches
+them into gzip-compressed JSONL files (one gzip member per batch) and
+starts a new file once the current one reaches the size limit. Files are
+named per process so several workers can share one log directory.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_PATTERN = 'interactions-*.jsonl.gz'
+
+
+class InteractionLogger:
+    """Non-blocking, batched writer for interaction records"""
+
+    _STOP = object()
+
+    def __init__(self, directory, max_file_bytes=64 * 1024 * 1024, batch_size=256,
+                 flush_interval=1.0, queue_size=10000):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "files": 0}
+        self.path = None
+        self.file_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name='interaction-log-writer', daemon=True)
+        self._writer.start()
+
+    def log(self, record):
+        """Enqueue a record; drops it (and counts the drop) rather than block when the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def close(self, timeout=5.0):
+        """Flush pending records and stop the writer thread"""
+        self.queue.put(self._STOP)
+        self._writer.join(timeout)
+
+    def _new_path(self):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        return os.path.join(self.directory, f"interactions-{stamp}-{os.getpid()}-{self.stats['files']}.jsonl.gz")
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not self._STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is self._STOP
+            records = [r for r in batch if r is not self._STOP]
+            if records:
+                try:
+                    self._write(records)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(records)} interaction records: {e}")
+                    self.stats["dropped"] += len(records)
+            if stop:
+                return
+
+    def _write(self, records):
+        lines = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records)
+        member = gzip.compress(lines.encode('utf-8'))
+
+        if self.path is None or self.file_bytes + len(member) > self.max_file_bytes:
+            self.path = self._new_path()
+            self.file_bytes = 0
+            self.stats["files"] += 1
+
+        with open(self.path, 'ab') as f:
+            f.write(member)
+        self.file_bytes += len(member)
+        self.stats["written"] += len(records)
+        self.stats["batches"] += 1
+
+
+def iter_interactions(directory, status=None):
+    """Stream records from every log file in directory, oldest file first"""
+    for path in sorted(glob.glob(os.path.join(directory, LOG_FILE_PATTERN))):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if status is None or record.get("status") == status:
+                        yield record
+        except (EOFError, OSError, ValueError, zlib.error) as e:
+            # A batch cut short by a crash only loses that batch
+            logger.warning(f"Stopped reading truncated log file {path}: {e}")
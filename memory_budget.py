@@ -0,0 +1,121 @@
+"""
+Memory accounting and budget planning.
+
+Accounting walks the chatbot's data structures and reports the bytes each
+one holds next to the process RSS, so the unaccounted rest (interpreter,
+libraries, allocator slack) is visible too. Planning turns a per-worker
+budget into concrete sizes: embedding precision, whether optional stages
+are loaded, and how large each cache may grow.
+"""
+import os
+import resource
+import sys
+from collections import deque
+
+MB = 1024 * 1024
+
+# RSS of the interpreter with torch, sentence-transformers, pandas and Flask imported,
+# before any model or data is loaded (measured on a CPU build of torch)
+RUNTIME_BASELINE_MB = 800
+
+# Approximate bytes per cache entry, measured on the default dataset
+RESULT_CACHE_ENTRY_BYTES = 1200
+SPELL_CACHE_ENTRY_BYTES = 250
+HISTORY_ENTRY_BYTES = 2000
+
+
+def process_rss():
+    """Current resident set size in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def module_bytes(model):
+    """Parameter and buffer bytes of a torch module (0 for remote or missing models)"""
+    if model is None or not hasattr(model, 'parameters'):
+        return 0
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def deep_sizeof(obj, exclude=None):
+    """Bytes held by obj and the containers, strings and arrays it references"""
+    seen = set(exclude or ())
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or item is None:
+            continue
+        seen.add(id(item))
+
+        if hasattr(item, 'memory_usage') and hasattr(item, 'columns'):  # pandas DataFrame
+            total += int(item.memory_usage(deep=True).sum())
+            continue
+        if hasattr(item, 'nbytes') and hasattr(item, 'base'):
+            # numpy array: includes the data when the array owns it, only the header for views
+            total += sys.getsizeof(item)
+            continue
+
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+    return total
+
+
+def sampled_sizeof(container, exclude=None, sample=256):
+    """deep_sizeof for large caches, extrapolated from the most recent entries"""
+    n = len(container)
+    if n <= sample:
+        return deep_sizeof(container, exclude)
+    if isinstance(container, dict):
+        # Keys and values only; the (key, value) tuples of items() don't exist in the dict
+        items = list(container.items())[-sample:]
+        parts = [key for key, _ in items] + [value for _, value in items]
+    else:
+        parts = list(container)[-sample:]
+    sampled = deep_sizeof(parts, exclude) - sys.getsizeof(parts)
+    return sys.getsizeof(container) + sampled * n // sample
+
+
+def plan_memory(budget_mb, model_mb, rows, dimension, reranker_mb, defaults, precision='auto'):
+    """Cache sizes, embedding dtype and optional stages that fit budget_mb (0 = no budget, use defaults)"""
+    plan = dict(defaults, embedding_dtype='float32', reranker=True, budget_mb=budget_mb, fits=True)
+    float32_mb = rows * dimension * 4 / MB
+
+    if budget_mb <= 0:
+        if precision == 'float16':
+            plan['embedding_dtype'] = 'float16'
+        return plan
+
+    available = budget_mb - RUNTIME_BASELINE_MB - model_mb
+    if precision == 'auto':
+        # Half precision once the matrix would take a large share of what is left
+        plan['embedding_dtype'] = 'float32' if float32_mb <= 0.25 * max(available, 0) else 'float16'
+    else:
+        plan['embedding_dtype'] = precision
+    available -= float32_mb / 2 if plan['embedding_dtype'] == 'float16' else float32_mb
+
+    plan['reranker'] = reranker_mb <= 0.5 * max(available, 0)
+    if plan['reranker']:
+        available -= reranker_mb
+
+    # The rest goes to caches, never above their configured sizes (small floors keep them working)
+    plan['fits'] = available > 0
+    available = max(available, 0) * MB
+    plan['session_memory_mb'] = min(defaults['session_memory_mb'], round(0.4 * available / MB, 2))
+    plan['result_cache_size'] = min(defaults['result_cache_size'],
+                                    max(64, int(0.25 * available // RESULT_CACHE_ENTRY_BYTES)))
+    plan['semantic_cache_size'] = min(defaults['semantic_cache_size'],
+                                      int(0.1 * available // (dimension * 4 + RESULT_CACHE_ENTRY_BYTES)))
+    plan['history_limit'] = min(defaults['history_limit'], max(100, int(0.15 * available // HISTORY_ENTRY_BYTES)))
+    plan['spell_cache_size'] = min(defaults['spell_cache_size'],
+                                   max(100, int(0.1 * available // SPELL_CACHE_ENTRY_BYTES)))
+    return plan
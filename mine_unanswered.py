@@ -0,0 +1,198 @@
+"""
+Mine the interaction log for questions the FAQ does not answer yet.
+
+Streams below-threshold queries from the interaction log, embeds them in
+bulk, clusters them with mini-batch k-means and reports the clusters ranked
+by size, with representative queries and the closest existing FAQ entries.
+Memory stays bounded: queries are processed in chunks and embeddings (and
+the query texts in the same order) are spilled to disk between the two
+passes, so the second pass never rereads a log that workers keep appending to.
+
+Usage:
+    python mine_unanswered.py --log-dir logs --clusters 50 --output unanswered.json
+"""
+import argparse
+import heapq
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+import server
+from interaction_log import iter_interactions
+
+
+def stream_queries(log_dir, chunk_size):
+    """Yield lists of processed below-threshold queries, chunk_size at a time"""
+    chunk = []
+    for record in iter_interactions(log_dir, status='below_threshold'):
+        text = record.get('processed_query')
+        if not text:
+            continue
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_spilled(texts_file, chunk_size, total):
+    """Yield the first total texts spilled in pass 1, chunk_size at a time"""
+    texts_file.seek(0)
+    chunk = []
+    for _, line in zip(range(total), texts_file):
+        chunk.append(json.loads(line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def embed_and_fit(chatbot, args, embeddings_file, texts_file):
+    """Pass 1: encode every query, spill embeddings and texts to disk and fit k-means incrementally"""
+    kmeans = MiniBatchKMeans(n_clusters=args.clusters, batch_size=args.chunk_size,
+                             random_state=0, n_init=3)
+    pending = []  # only held until there are enough samples to initialize k clusters
+    pending_rows = 0
+    total = 0
+    fitted = False
+
+    for chunk in stream_queries(args.log_dir, args.chunk_size):
+        embeddings = np.asarray(chatbot.encode(chunk, batch_size=args.batch_size), dtype=np.float32)
+        embeddings_file.write(embeddings.tobytes())
+        texts_file.writelines(json.dumps(text, ensure_ascii=False) + '\n' for text in chunk)
+        total += len(embeddings)
+        print(f"  embedded {total} queries", end='\r')
+
+        if fitted:
+            kmeans.partial_fit(embeddings)
+            continue
+        pending.append(embeddings)
+        pending_rows += len(embeddings)
+        if pending_rows >= args.clusters:
+            kmeans.partial_fit(np.vstack(pending))
+            pending, fitted = [], True
+    print()
+
+    if not fitted and total:
+        # Fewer queries than requested clusters
+        kmeans = MiniBatchKMeans(n_clusters=min(args.clusters, total), random_state=0, n_init=3)
+        kmeans.fit(np.vstack(pending))
+
+    embeddings_file.flush()
+    texts_file.flush()
+    return kmeans, total
+
+
+def summarize_clusters(chatbot, args, kmeans, embeddings, texts_file):
+    """Pass 2: assign queries to clusters, keep the examples closest to each centroid"""
+    n_clusters = kmeans.n_clusters
+    centroids = kmeans.cluster_centers_ / np.linalg.norm(kmeans.cluster_centers_, axis=1, keepdims=True)
+    sizes = np.zeros(n_clusters, dtype=np.int64)
+    similarity_sums = np.zeros(n_clusters)
+    examples = [[] for _ in range(n_clusters)]  # min-heaps of (similarity, text)
+    seen = [set() for _ in range(n_clusters)]
+
+    # Texts come from the pass 1 spill, so they line up with the embeddings row for row
+    offset = 0
+    for chunk in stream_spilled(texts_file, args.chunk_size, len(embeddings)):
+        chunk_embeddings = np.asarray(embeddings[offset:offset + len(chunk)])
+        offset += len(chunk)
+
+        labels = kmeans.predict(chunk_embeddings)
+        similarities = np.einsum('ij,ij->i', chunk_embeddings, centroids[labels])
+        np.add.at(sizes, labels, 1)
+        np.add.at(similarity_sums, labels, similarities)
+
+        for text, label, similarity in zip(chunk, labels, similarities):
+            if text in seen[label]:
+                continue
+            heap = examples[label]
+            if len(heap) < args.examples:
+                heapq.heappush(heap, (float(similarity), text))
+                seen[label].add(text)
+            elif similarity > heap[0][0]:
+                _, dropped = heapq.heapreplace(heap, (float(similarity), text))
+                seen[label].discard(dropped)
+                seen[label].add(text)
+
+    faq_similarities = centroids @ chatbot.question_embeddings.T
+    total = int(sizes.sum())
+
+    clusters = []
+    for label in np.argsort(sizes)[::-1]:
+        if sizes[label] < args.min_cluster_size:
+            continue
+        nearest = np.argsort(faq_similarities[label])[::-1][:3]
+        clusters.append({
+            "cluster": int(label),
+            "size": int(sizes[label]),
+            "share": round(float(sizes[label]) / total, 4),
+            "cohesion": round(float(similarity_sums[label] / sizes[label]), 4),
+            "examples": [text for _, text in sorted(examples[label], reverse=True)],
+            "nearest_faq": [
+                {
+                    "id": int(i),
+                    "question": chatbot.df.iloc[i]['pertanyaan'],
+                    "category": chatbot.df.iloc[i]['kategori'],
+                    "similarity": round(float(faq_similarities[label][i]), 4)
+                }
+                for i in nearest
+            ]
+        })
+    return clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster unanswered (below-threshold) queries")
+    parser.add_argument('--log-dir', default=server.INTERACTION_LOG_DIR or 'logs')
+    parser.add_argument('--dataset', default="dataset.json" if os.path.exists("dataset.json") else None)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=4096, help="Queries per encode/fit step")
+    parser.add_argument('--batch-size', type=int, default=128, help="Encoder batch size")
+    parser.add_argument('--examples', type=int, default=5, help="Representative queries per cluster")
+    parser.add_argument('--min-cluster-size', type=int, default=2)
+    parser.add_argument('--output', default='unanswered_clusters.json')
+    args = parser.parse_args()
+
+    chatbot = server.ChatbotUPATIK(json_file_path=args.dataset, use_lightweight_model=True)
+    if chatbot.model is None or chatbot.question_embeddings is None:
+        raise SystemExit("Model not available, cannot embed queries")
+    dim = chatbot.question_embeddings.shape[1]
+
+    start = time.time()
+    with tempfile.NamedTemporaryFile(prefix='unanswered-', suffix='.f32') as embeddings_file, \
+            tempfile.TemporaryFile('w+', encoding='utf-8', prefix='unanswered-', suffix='.jsonl') as texts_file:
+        kmeans, total = embed_and_fit(chatbot, args, embeddings_file, texts_file)
+        if total == 0:
+            print(f"No below-threshold queries found in {args.log_dir}")
+            return
+        print(f"Embedded {total} queries in {time.time() - start:.1f}s, "
+              f"clustering into {kmeans.n_clusters} clusters")
+
+        embeddings = np.memmap(embeddings_file.name, dtype=np.float32, mode='r', shape=(total, dim))
+        clusters = summarize_clusters(chatbot, args, kmeans, embeddings, texts_file)
+        del embeddings
+
+    report = {
+        "generated_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "total_queries": total,
+        "clusters": clusters
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for cluster in clusters[:10]:
+        nearest = cluster["nearest_faq"][0]
+        print(f"[{cluster['size']:>6}] {cluster['examples'][0]!r}  "
+              f"(nearest FAQ {nearest['similarity']:.2f}: {nearest['question']})")
+    print(f"Report written to {args.output} ({len(clusters)} clusters)")
+
+
+if __name__ == '__main__':
+    main()
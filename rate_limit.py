@@ -0,0 +1,135 @@
+"""
+Admission control: per-client token buckets and a global inference slot limit.
+
+Buckets live in a lock-striped in-memory store by default, so request
+threads only contend when their keys hash to the same stripe. A store
+backed by a Redis-compatible server (Redis, Valkey, KeyDB, ...) can be
+plugged in instead, which lets several workers share one budget per client.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBucketStore:
+    """Token buckets per key, spread over independently locked stripes"""
+
+    backend = "memory"
+
+    def __init__(self, stripes=64, max_keys=100000):
+        self.stripes = [(threading.Lock(), OrderedDict()) for _ in range(stripes)]
+        self.max_keys_per_stripe = max(1, max_keys // stripes)
+
+    def take(self, key, rate, burst, now):
+        """Take one token for key, returns (allowed, seconds until a token is available)"""
+        lock, buckets = self.stripes[hash(key) % len(self.stripes)]
+        with lock:
+            tokens, updated = buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now)
+            if len(buckets) > self.max_keys_per_stripe:
+                # Least recently seen client; an idle bucket would be full again anyway
+                buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets in self.stripes)
+
+
+class RedisBucketStore:
+    """Token buckets in a Redis-compatible server, updated atomically by a Lua script"""
+
+    backend = "redis"
+
+    # KEYS[1] = bucket, ARGV = rate, burst, now; returns {allowed, retry_after * 1000}
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+if allowed == 1 then return {1, 0} end
+return {0, math.ceil((1 - tokens) / rate * 1000)}
+"""
+
+    def __init__(self, url, prefix='chatbot:ratelimit:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.prefix = prefix
+        self._take = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst, now):
+        # Keys are hashed so client IPs and session ids are not stored in the clear
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+        allowed, retry_ms = self._take(keys=[self.prefix + digest], args=[rate, burst, now])
+        return bool(allowed), retry_ms / 1000
+
+    def __len__(self):
+        return 0  # not tracked locally
+
+
+class TokenBucketLimiter:
+    """Allows burst requests at once and rate requests per second after that, per client key"""
+
+    def __init__(self, rate, burst, store=None):
+        self.rate = rate
+        self.burst = burst
+        self.store = store if store is not None else MemoryBucketStore()
+
+    def acquire(self, key):
+        """Returns (allowed, retry_after_seconds); fails open if a remote store is unreachable"""
+        try:
+            return self.store.take(key, self.rate, self.burst, time.time())
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, request admitted: {e}")
+            return True, 0.0
+
+
+class ConcurrencyLimiter:
+    """Bounds how many requests run inference at once; the rest wait briefly, then are rejected"""
+
+    def __init__(self, max_concurrent, max_wait):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def acquire(self):
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.max_wait)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class Overloaded(Exception):
+    """No inference slot became free in time"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
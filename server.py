@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -10,13 +10,507 @@ import logging
 import os
 import gc
 import threading
+import contextlib
+import atexit
+import uuid
+import gzip
+import hashlib
+from collections import Counter, OrderedDict, deque
+from rate_limit import TokenBucketLimiter, MemoryBucketStore, ConcurrencyLimiter, Overloaded
+from memory_budget import plan_memory, deep_sizeof, sampled_sizeof, module_bytes, process_rss
+
+# Optional faster JSON encoder and brotli compression; stdlib json / gzip are used without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Files shipped with the server are found next to it, whatever the working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Sentence encoder profile from the model registry (empty = the registry default)
+MODEL_REGISTRY_FILE = os.environ.get('CHATBOT_MODEL_REGISTRY', os.path.join(BASE_DIR, 'model_registry.json'))
+MODEL_PROFILE = os.environ.get('CHATBOT_MODEL', '')
+MODEL_CACHE_DIR = os.environ.get('CHATBOT_MODEL_CACHE', os.path.join(BASE_DIR, 'model_cache'))
+# Used when the registry is unusable or has no entry for the profile
+DEFAULT_THRESHOLD = 0.7
+
+# Prebuilt question embeddings (see build_index.py); re-encoded at startup when missing or stale
+INDEX_FILE = os.environ.get('CHATBOT_INDEX_FILE', 'index.npz')
+
+# CPU execution settings (0 = derive from the detected core count)
+INTRA_OP_THREADS = int(os.environ.get('CHATBOT_INTRA_OP_THREADS', '0'))
+INTER_OP_THREADS = int(os.environ.get('CHATBOT_INTER_OP_THREADS', '0'))
+WORKERS_PER_NODE = int(os.environ.get('CHATBOT_WORKERS', '1'))
+ENCODER_COMPILE = os.environ.get('CHATBOT_ENCODER_COMPILE', 'none')  # none | compile | trace
+CPU_AFFINITY = os.environ.get('CHATBOT_CPU_AFFINITY', '')  # e.g. "0-3" or "0,2,4,6"
+
+# Shared encoder processes (see encoder_server.py), comma separated Unix socket paths
+ENCODER_SOCKETS = [p for p in os.environ.get('CHATBOT_ENCODER_SOCKETS', '').split(',') if p]
+
+# Centroid pre-routing: only score the closest categories once the corpus is large enough
+CENTROID_ROUTING_MIN_ROWS = int(os.environ.get('CHATBOT_CENTROID_ROUTING_MIN_ROWS', '5000'))
+CENTROID_ROUTING_TOP_K = int(os.environ.get('CHATBOT_CENTROID_ROUTING_TOP_K', '2'))
+
+# Per-session context store
+SESSION_MEMORY_MB = float(os.environ.get('CHATBOT_SESSION_MEMORY_MB', '16'))
+SESSION_TTL = int(os.environ.get('CHATBOT_SESSION_TTL', '1800'))  # seconds
+SESSION_TURNS = int(os.environ.get('CHATBOT_SESSION_TURNS', '3'))  # 0 = no session context
+CONTEXT_WEIGHT = float(os.environ.get('CHATBOT_CONTEXT_WEIGHT', '0.35'))
+
+# Number of candidates kept from the embedding search (logged, and used by later stages)
+SEARCH_TOP_K = int(os.environ.get('CHATBOT_TOP_K', '5'))
+
+# Interaction log written by a background thread (empty directory disables it)
+INTERACTION_LOG_DIR = os.environ.get('CHATBOT_INTERACTION_LOG_DIR', 'logs')
+INTERACTION_LOG_MAX_MB = float(os.environ.get('CHATBOT_INTERACTION_LOG_MAX_MB', '64'))
+
+# Calibrated per-entry / per-category thresholds (see calibrate_thresholds.py)
+THRESHOLDS_FILE = os.environ.get('CHATBOT_THRESHOLDS_FILE', 'thresholds.json')
+
+# Optional cross-encoder reranking of ambiguous top-k candidates (empty model name disables it)
+RERANKER_MODEL = os.environ.get('CHATBOT_RERANKER_MODEL', '')  # e.g. cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+RERANK_MARGIN = float(os.environ.get('CHATBOT_RERANK_MARGIN', '0.08'))
+RERANK_BUDGET_MS = float(os.environ.get('CHATBOT_RERANK_BUDGET_MS', '60'))
+
+# Query spelling correction against the dataset vocabulary plus a lexicon file
+SPELLING_CORRECTION = os.environ.get('CHATBOT_SPELLING_CORRECTION', '0') == '1'
+LEXICON_FILE = os.environ.get('CHATBOT_LEXICON_FILE', os.path.join(BASE_DIR, 'lexicon.txt'))
+# General words that are never corrected
+WORDLIST_FILE = os.environ.get('CHATBOT_WORDLIST_FILE', os.path.join(BASE_DIR, 'wordlist_id.txt'))
+SPELLING_MAX_DISTANCE = int(os.environ.get('CHATBOT_SPELLING_MAX_DISTANCE', '2'))
+
+# Admission control: token bucket per client (rate 0 disables it) and a global limit on
+# requests running inference; the rest wait up to ADMISSION_WAIT_MS and then get a 503
+RATE_LIMIT_RATE = float(os.environ.get('CHATBOT_RATE_LIMIT_RATE', '0'))  # requests per second per client, 0 = off
+RATE_LIMIT_BURST = float(os.environ.get('CHATBOT_RATE_LIMIT_BURST', '10'))
+RATE_LIMIT_KEY = os.environ.get('CHATBOT_RATE_LIMIT_KEY', 'ip')  # ip | session
+RATE_LIMIT_REDIS_URL = os.environ.get('CHATBOT_RATE_LIMIT_REDIS_URL', '')  # shared buckets across workers
+TRUST_PROXY = os.environ.get('CHATBOT_TRUST_PROXY', '0') == '1'  # use X-Forwarded-For for the client IP
+MAX_CONCURRENT_INFERENCE = int(os.environ.get('CHATBOT_MAX_CONCURRENT_INFERENCE', '8'))
+ADMISSION_WAIT_MS = float(os.environ.get('CHATBOT_ADMISSION_WAIT_MS', '200'))
+
+# Degradation ladder: under load, step down full -> semantic (no rerank) -> cached -> lexical (BM25)
+DEGRADATION = os.environ.get('CHATBOT_DEGRADATION', '1') == '1'
+LATENCY_SLO_MS = float(os.environ.get('CHATBOT_LATENCY_SLO_MS', '300'))  # encode + search + rerank
+DEGRADE_QUEUE_DEPTH = int(os.environ.get('CHATBOT_DEGRADE_QUEUE_DEPTH', '4'))  # requests per tier step
+DEGRADE_RECOVERY_SECONDS = float(os.environ.get('CHATBOT_DEGRADE_RECOVERY_SECONDS', '5'))
+RESULT_CACHE_SIZE = int(os.environ.get('CHATBOT_RESULT_CACHE_SIZE', '4096'))  # answers for the cached tier
+
+# Near-duplicate queries ("reset pw siakad gimana" after "cara reset password siakad") reuse the
+# ranked candidates of a recent query whose embedding is at least this similar (0 entries disables it)
+SEMANTIC_CACHE_SIZE = int(os.environ.get('CHATBOT_SEMANTIC_CACHE_SIZE', '2048'))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('CHATBOT_SEMANTIC_CACHE_THRESHOLD', '0.93'))
+
+# Per-worker memory budget (0 = unlimited): sizes the caches below, the embedding precision and
+# whether the reranker is loaded; /api/stats reports what each part actually holds
+MEMORY_BUDGET_MB = float(os.environ.get('CHATBOT_MEMORY_BUDGET_MB', '0'))
+EMBEDDING_PRECISION = os.environ.get('CHATBOT_EMBEDDING_PRECISION', 'auto')  # auto | float32 | float16
+HISTORY_LIMIT = int(os.environ.get('CHATBOT_HISTORY_LIMIT', '10000'))  # conversation history entries kept
+RERANKER_MEMORY_MB = float(os.environ.get('CHATBOT_RERANKER_MEMORY_MB', '130'))
+SPELL_CACHE_SIZE = int(os.environ.get('CHATBOT_SPELL_CACHE_SIZE', '20000'))
+
+# Streamed answers are sent in chunks of roughly this many characters (split on whitespace)
+STREAM_CHUNK_CHARS = int(os.environ.get('CHATBOT_STREAM_CHUNK_CHARS', '48'))
+
+# Chat responses at least this large are compressed when the client accepts gzip or br
+COMPRESS_MIN_BYTES = int(os.environ.get('CHATBOT_COMPRESS_MIN_BYTES', '1024'))
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+_timestamp_cache = (None, None)
+
+def current_timestamp():
+    """Formatted local time, formatted at most once per second"""
+    global _timestamp_cache
+    second = int(time.time())
+    if _timestamp_cache[0] != second:
+        _timestamp_cache = (second, datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S"))
+    return _timestamp_cache[1]
+
+def load_model_registry(path):
+    """Read the model registry, {"default": ..., "lightweight": ..., "models": {profile: spec}}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    for profile, spec in registry.get("models", {}).items():
+        missing = {"name", "dimension", "threshold"} - set(spec)
+        if missing:
+            raise ValueError(f"Model profile '{profile}' is missing {sorted(missing)}")
+    return registry
+
+def model_fallback_chain(registry, profile):
+    """The profile followed by its declared fallbacks, without cycles"""
+    chain = []
+    while profile and profile not in chain:
+        if profile not in registry["models"]:
+            raise ValueError(f"Unknown model profile '{profile}'")
+        chain.append(profile)
+        profile = registry["models"][profile].get("fallback")
+    return chain
+
+def load_sentence_model(spec, device):
+    """Load a registered encoder strictly from local files, never from the network"""
+    from sentence_transformers import SentenceTransformer
+
+    # Relative paths in the registry are relative to the registry file
+    path = spec.get("path") and os.path.join(os.path.dirname(os.path.abspath(MODEL_REGISTRY_FILE)), spec["path"])
+    if path and os.path.isdir(path):
+        model = SentenceTransformer(path, device=device, local_files_only=True)
+    else:
+        model = SentenceTransformer(spec["name"], device=device, cache_folder=MODEL_CACHE_DIR,
+                                    local_files_only=True)
+
+    dimension = model.get_sentence_embedding_dimension()
+    if dimension != spec["dimension"]:
+        raise ValueError(f"{spec['name']} produces {dimension}-d embeddings, registry says {spec['dimension']}")
+    if spec.get("max_seq_length"):
+        model.max_seq_length = spec["max_seq_length"]
+    model.eval()
+    return model
+
+def texts_digest(texts):
+    """Fingerprint of the exact texts an index was built from"""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def transformer_submodule(transformer):
+    """Name of the submodule the sentence-transformers Transformer module calls in forward()"""
+    # Recent versions keep the model under "model" (auto_model is a read-only alias), older ones under "auto_model"
+    for name in ('model', 'auto_model'):
+        if name in transformer._modules:
+            return name
+    raise ValueError(f"No transformer submodule in {type(transformer).__name__}")
+
+@contextlib.contextmanager
+def counting_forward(module):
+    """Count calls to module.forward while inside the block (sentence-transformers may bypass __call__ hooks)"""
+    calls = []
+    own = module.__dict__.get('forward')
+    forward = module.forward
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return forward(*args, **kwargs)
+
+    module.forward = counted
+    try:
+        yield calls
+    finally:
+        if own is not None:
+            module.forward = own
+        else:
+            del module.forward
+
+def trace_transformer(model, features):
+    """TorchScript trace of a Hugging Face encoder, callable the way sentence-transformers calls the original"""
+    import torch
+    from transformers.modeling_outputs import BaseModelOutput
+
+    input_names = [k for k in ('input_ids', 'attention_mask', 'token_type_ids') if k in features]
+    with torch.inference_mode():
+        traced = torch.jit.freeze(torch.jit.trace(model.eval(), example_kwarg_inputs={k: features[k] for k in input_names},
+                                                  strict=False))
+
+    class TracedEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.traced = traced
+            self.config = model.config
+
+        def forward(self, input_ids, attention_mask=None, token_type_ids=None, **kwargs):
+            inputs = {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+            output = self.traced(**{k: inputs[k] for k in input_names})
+            hidden = output['last_hidden_state'] if isinstance(output, dict) else output[0]
+            # Indexable by position (older sentence-transformers) and by name (newer)
+            return BaseModelOutput(last_hidden_state=hidden)
+
+    return TracedEncoder()
+
+def available_cores():
+    """Number of CPU cores this process is allowed to run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def default_thread_counts(cores, workers=1):
+    """Split the cores evenly between workers, one inter-op thread each"""
+    intra_op = max(1, cores // max(1, workers))
+    return intra_op, 1
+
+def parse_cpu_list(spec):
+    """Parse a CPU list like "0-3,6" into [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def configure_torch_runtime(intra_op_threads=0, inter_op_threads=0, cpu_affinity=''):
+    """Pin the process to CPU cores and size the torch thread pools"""
+    import torch
+
+    pinned = False
+    if cpu_affinity:
+        try:
+            os.sched_setaffinity(0, parse_cpu_list(cpu_affinity))
+            pinned = True
+        except (AttributeError, ValueError, OSError) as e:
+            logger.warning(f"Could not apply CPU affinity '{cpu_affinity}': {e}")
+
+    cores = available_cores()
+    # Pinned workers already own a disjoint slice of the node
+    default_intra, default_inter = default_thread_counts(cores, 1 if pinned else WORKERS_PER_NODE)
+    intra_op_threads = intra_op_threads or default_intra
+    inter_op_threads = inter_op_threads or default_inter
+
+    torch.set_num_threads(intra_op_threads)
+    try:
+        torch.set_num_interop_threads(inter_op_threads)
+    except RuntimeError as e:
+        # Can only be set once, before any inter-op parallel work has started
+        logger.warning(f"Inter-op threads already fixed at {torch.get_num_interop_threads()}: {e}")
+
+    settings = {
+        "cores": cores,
+        "cpu_affinity": sorted(os.sched_getaffinity(0)) if pinned else None,
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads()
+    }
+    logger.info(f"Torch CPU runtime configured: {settings}")
+    return settings
+
+class SessionStore:
+    """LRU store of recent query embeddings per session, bounded by TTL and a byte budget"""
+
+    # Rough fixed cost of one session entry (dict, deque, key) on top of the embeddings
+    ENTRY_OVERHEAD = 600
+
+    def __init__(self, max_bytes, ttl, max_turns):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.sessions = OrderedDict()  # least recently used first
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _entry_bytes(self, entry):
+        return self.ENTRY_OVERHEAD + sum(e.nbytes for e in entry["embeddings"])
+
+    def _drop(self, session_id):
+        entry = self.sessions.pop(session_id)
+        self.bytes -= self._entry_bytes(entry)
+
+    def _expire(self, now):
+        # Access order is also last-seen order, so expired sessions sit at the front
+        while self.sessions:
+            session_id, entry = next(iter(self.sessions.items()))
+            if now - entry["last_seen"] <= self.ttl:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def context(self, session_id):
+        """Decay-weighted, normalized mix of the session's recent query embeddings, or None"""
+        with self._lock:
+            self._expire(time.time())
+            entry = self.sessions.get(session_id)
+            if entry is None or not entry["embeddings"]:
+                return None
+            self.sessions.move_to_end(session_id)
+            embeddings = list(entry["embeddings"])
+
+        # Most recent turn weighs 1, the one before 0.5, ...
+        weights = 0.5 ** np.arange(len(embeddings))[::-1]
+        context = np.average(np.vstack(embeddings), axis=0, weights=weights)
+        norm = np.linalg.norm(context)
+        return context / norm if norm else None
+
+    def add(self, session_id, embedding):
+        """Record the embedding of the session's latest query"""
+        if self.max_turns < 1:
+            # Session context disabled; a deque(maxlen=0) stays empty and [0] on it would raise
+            return
+        embedding = np.asarray(embedding, dtype=np.float32).copy()
+        now = time.time()
+        with self._lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                entry = {"embeddings": deque(maxlen=self.max_turns), "last_seen": now}
+                self.sessions[session_id] = entry
+                self.bytes += self.ENTRY_OVERHEAD
+            else:
+                self.sessions.move_to_end(session_id)
+
+            if len(entry["embeddings"]) == self.max_turns:
+                self.bytes -= entry["embeddings"][0].nbytes
+            entry["embeddings"].append(embedding)
+            entry["last_seen"] = now
+            self.bytes += embedding.nbytes
+
+            self._expire(now)
+            while self.bytes > self.max_bytes and len(self.sessions) > 1:
+                self._drop(next(iter(self.sessions)))
+                self.evictions += 1
+
+    def clear(self, session_id=None):
+        """Forget one session, or all of them"""
+        with self._lock:
+            if session_id is None:
+                self.sessions.clear()
+                self.bytes = 0
+            elif session_id in self.sessions:
+                self._drop(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
+
+class SemanticCache:
+    """Ring buffer of recent query embeddings and their ranked candidates, matched by cosine similarity"""
+
+    def __init__(self, capacity, dimension, threshold):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.embeddings = np.zeros((capacity, dimension), dtype=np.float32)
+        self.categories = [None] * capacity
+        self.candidates = [None] * capacity
+        self.size = 0
+        self.next = 0  # slot overwritten by the next insert (the oldest once full)
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding, category):
+        """Candidates of the most similar cached query for the same category, or None below the threshold"""
+        if not self.capacity:
+            return None
+        with self._lock:
+            self.lookups += 1
+            if not self.size:
+                return None
+            scores = self.embeddings[:self.size] @ embedding
+            for slot in np.argsort(scores)[::-1]:
+                if scores[slot] < self.threshold:
+                    return None
+                if self.categories[slot] == category:
+                    self.hits += 1
+                    return self.candidates[slot]
+        return None
+
+    def add(self, embedding, category, candidates):
+        if not self.capacity:
+            return
+        with self._lock:
+            slot = self.next
+            self.embeddings[slot] = embedding
+            self.categories[slot] = category
+            self.candidates[slot] = candidates
+            self.next = (slot + 1) % self.capacity
+            self.size = max(self.size, slot + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self.size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0
+            }
+
+class DegradationLadder:
+    """Picks the serving tier from inference queue depth and recent latency, and recovers by itself"""
+
+    TIERS = ("full", "semantic", "cached", "lexical")
+    STEP_INTERVAL = 1.0  # at most one latency-driven step down per second
+    MODEL_TIERS = 2  # full and semantic run the encoder; the tiers below never call observe()
+
+    def __init__(self, latency_slo_ms, queue_depth, recovery_seconds, enabled=True):
+        self.latency_slo_ms = latency_slo_ms
+        self.queue_depth = max(1, queue_depth)
+        self.recovery_seconds = recovery_seconds
+        self.enabled = enabled
+        self.level = 0
+        self.latency_ms = None  # moving average of the model stages
+        self.changed_at = time.monotonic()
+        self.transitions = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms):
+        with self._lock:
+            self.latency_ms = latency_ms if self.latency_ms is None else 0.8 * self.latency_ms + 0.2 * latency_ms
+
+    def tier(self, queue_depth):
+        """Tier for a request arriving with queue_depth requests in (or waiting for) inference"""
+        if not self.enabled:
+            return self.TIERS[0]
+        with self._lock:
+            now = time.monotonic()
+            level = self.level
+            slow = self.latency_ms is not None and self.latency_ms > self.latency_slo_ms
+            if queue_depth >= self.queue_depth or slow:
+                level = max(level, min(len(self.TIERS) - 1, queue_depth // self.queue_depth))
+                if slow and level == self.level and now - self.changed_at >= self.STEP_INTERVAL:
+                    level = min(len(self.TIERS) - 1, level + 1)
+            elif level > 0 and now - self.changed_at >= self.recovery_seconds:
+                level -= 1
+                # Lower tiers don't run the model, so the old average says nothing about now
+                self.latency_ms = None
+
+            if level != self.level:
+                log = logger.warning if level > self.level else logger.info
+                log(f"Serving tier {self.TIERS[self.level]} -> {self.TIERS[level]} "
+                    f"(queue depth {queue_depth}, latency {self.latency_ms or 0:.0f} ms)")
+                self.level = level
+                self.changed_at = now
+                self.transitions += 1
+                if level >= self.MODEL_TIERS:
+                    # No new samples arrive here, so a stale slow average would keep stepping down
+                    # and block recovery; only queue depth counts until the model runs again
+                    self.latency_ms = None
+            return self.TIERS[level]
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "tier": self.TIERS[self.level],
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "latency_slo_ms": self.latency_slo_ms,
+            "queue_depth_step": self.queue_depth,
+            "transitions": self.transitions
+        }
+
 class ChatbotUPATIK:
-    def __init__(self, json_file_path=None, use_lightweight_model=True):
+    def __init__(self, json_file_path=None, use_lightweight_model=True, encoder_sockets=None, load_model=True):
         """
         TAHAP 1 INISIALISASI CHATBOT - OPTIMIZED FOR LOW MEMORY
         """
@@ -27,38 +521,158 @@ class ChatbotUPATIK:
         
         # Initialize model as None first
         self.model = None
+        self.reranker = None
+        self._rerank_pair_ms = None  # moving average cost of scoring one pair
+        self._rerank_budget_skips = 0  # consecutive budget skips since the last measurement
         self.question_embeddings = None
         self.processed_questions = None
+        self.runtime_config = {"device": None, "encoder_compile": "none"}
+        self._inference_mode = contextlib.nullcontext
+        # One forward pass at a time, so request threads don't fight over the intra-op pool
+        self._encode_lock = threading.Lock()
+        self.encoder_sockets = ENCODER_SOCKETS if encoder_sockets is None else encoder_sockets
+
+        # Requested encoder profile; initialize_model records the one actually loaded
+        try:
+            self.model_registry = load_model_registry(MODEL_REGISTRY_FILE)
+        except (OSError, ValueError) as e:
+            # Like a failed model load: keep serving with lexical matching
+            logger.error(f"Model registry {MODEL_REGISTRY_FILE} unusable, no model will be loaded: {e}")
+            self.model_registry = {"models": {}}
+        self.model_profile = self.model_registry.get("lightweight" if use_lightweight_model else "default")
+        if MODEL_PROFILE in self.model_registry["models"]:
+            self.model_profile = MODEL_PROFILE
+        elif MODEL_PROFILE:
+            logger.error(f"Unknown model profile '{MODEL_PROFILE}' (CHATBOT_MODEL), using {self.model_profile}; "
+                         f"registered: {', '.join(self.model_registry['models'])}")
         
         # Load dataset first
         self.json_file_path = json_file_path
         self.load_dataset()
-        
-        # Initialize conversation storage
-        self.conversation_history = []
+        self.build_category_index()
+        self.build_fast_path()
+        self.build_lexical_index()
+        self.build_answer_payloads()
+        # Provisional plan from the requested profile; initialize_model re-plans for the one it loads
+        self.plan_memory()
         self.evaluation_data = []
-        
-        # Set threshold
-        self.threshold = 0.7 if use_lightweight_model else 0.8
-        
-        # Try to initialize model
-        self.initialize_model(use_lightweight_model)
+
+        # Request counters (fast path hits, ...) shared by all request threads
+        self.counters = Counter()
+        self._counter_lock = threading.Lock()
+
+        # Requests allowed to run (or queue for) the encoder at the same time
+        self.inference_slots = ConcurrencyLimiter(MAX_CONCURRENT_INFERENCE, ADMISSION_WAIT_MS / 1000)
+        self.ladder = DegradationLadder(LATENCY_SLO_MS, DEGRADE_QUEUE_DEPTH, DEGRADE_RECOVERY_SECONDS, DEGRADATION)
+        # Recent semantic results by (query, category), served without the encoder in the cached tier
+        self.result_cache = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+
+        # Try to initialize model (offline tools that only need the dataset skip it)
+        if load_model:
+            self.initialize_model(use_lightweight_model)
+        else:
+            self.processed_questions = [self.preprocess_text(q) for q in self.df['pertanyaan']]
+
+        # Sized from the final memory plan, i.e. after the model that is actually served is known
+        self.build_spell_corrector()
+        # Initialize conversation storage (bounded, oldest entries drop out)
+        self.conversation_history = deque(maxlen=self.memory_plan["history_limit"])
+        # Recent query embeddings per session, for follow-up questions
+        self.sessions = SessionStore(int(self.memory_plan["session_memory_mb"] * 1024 * 1024), SESSION_TTL, SESSION_TURNS)
+
+        # Set threshold (calibrated per model, so resolved after the model is known)
+        self.threshold = self.model_spec().get("threshold", DEFAULT_THRESHOLD)
+        self.load_thresholds(THRESHOLDS_FILE)
+
+        # Recent semantic results by query embedding, for paraphrases of questions just answered;
+        # sized from the loaded index (a remote encoder may not be in the registry), none without a model
+        if self.model is not None and self.question_embeddings is not None:
+            self.semantic_cache = SemanticCache(self.memory_plan["semantic_cache_size"],
+                                                self.question_embeddings.shape[1], SEMANTIC_CACHE_THRESHOLD)
+        else:
+            self.semantic_cache = SemanticCache(0, 0, SEMANTIC_CACHE_THRESHOLD)
+
+        # Structures that no longer change after startup are measured once
+        self.static_memory = self.measure_static_memory()
         
         logger.info(f"Chatbot initialization completed! Dataset: {len(self.df)} pertanyaan dari {len(self.df['kategori'].unique())} kategori")
 
+    def model_spec(self):
+        """Registry entry of the current model profile ({} when it is not registered)"""
+        return self.model_registry["models"].get(self.model_profile) or {}
+
+    def plan_memory(self):
+        """Size caches, embedding precision and optional stages from CHATBOT_MEMORY_BUDGET_MB"""
+        spec = self.model_spec()
+        # With encoder sockets the weights live in the encoder processes, not in this worker
+        model_mb = 0 if self.encoder_sockets else spec.get("memory_mb", 0)
+        dimension = self.model.get_sentence_embedding_dimension() if self.model is not None else spec.get("dimension", 0)
+        self.memory_plan = plan_memory(
+            MEMORY_BUDGET_MB, model_mb, len(self.df), dimension or 0,
+            RERANKER_MEMORY_MB if RERANKER_MODEL else 0,
+            defaults={
+                "session_memory_mb": SESSION_MEMORY_MB,
+                "result_cache_size": RESULT_CACHE_SIZE,
+                "semantic_cache_size": SEMANTIC_CACHE_SIZE,
+                "history_limit": HISTORY_LIMIT,
+                "spell_cache_size": SPELL_CACHE_SIZE
+            },
+            precision=EMBEDDING_PRECISION
+        )
+        if not self.memory_plan["fits"]:
+            logger.warning(f"Memory budget {MEMORY_BUDGET_MB} MB is too small for model {self.model_profile} "
+                           f"and {len(self.df)} embeddings, caches reduced to their minimum")
+        logger.info(f"Memory plan: {self.memory_plan}")
+
+    def measure_static_memory(self):
+        """Bytes held by the model, embeddings and FAQ structures (fixed after startup)"""
+        # Payload keys, cached answers and history entries share the dataset's strings; count those once
+        self._shared_ids = {id(text) for column in ('pertanyaan', 'jawaban', 'kategori') for text in self.df[column]}
+        faq_store = deep_sizeof(self.df) + deep_sizeof(
+            [self.processed_questions, self.fast_path, self.answer_payloads, self.answer_streams,
+             self.lexical_index, self.lexical_vocab], self._shared_ids)
+        return {
+            "model_weights": module_bytes(self.model) + module_bytes(self.reranker),
+            "embeddings": deep_sizeof([self.question_embeddings, getattr(self, 'category_centroids', None),
+                                       self.row_thresholds]),
+            "faq_store": faq_store,
+            "spelling_index": deep_sizeof([self.spell_corrector.words, self.spell_corrector.deletes,
+                                           self.spell_corrector.abbreviations])
+                              if self.spell_corrector is not None else 0
+        }
+
+    def memory_usage(self):
+        """Bytes per component plus process RSS; dynamic parts are sampled for large caches"""
+        usage = dict(self.static_memory)
+        usage["caches"] = {
+            "sessions": self.sessions.bytes,
+            "result_cache": sampled_sizeof(self.result_cache, self._shared_ids),
+            "semantic_cache": deep_sizeof([self.semantic_cache.embeddings, self.semantic_cache.candidates]),
+            "spelling_cache": sampled_sizeof(self.spell_corrector.cache, self._shared_ids)
+                              if self.spell_corrector is not None else 0
+        }
+        usage["conversation_history"] = sampled_sizeof(self.conversation_history, self._shared_ids)
+        accounted = sum(v for v in usage.values() if isinstance(v, int)) + sum(usage["caches"].values())
+        rss = process_rss()
+
+        to_mb = lambda b: round(b / (1024 * 1024), 2)
+        report = {k: to_mb(v) for k, v in usage.items() if isinstance(v, int)}
+        report["caches"] = {k: to_mb(v) for k, v in usage["caches"].items()}
+        report.update({"accounted": to_mb(accounted), "rss": to_mb(rss), "unaccounted": to_mb(rss - accounted)})
+        return report
+
     def initialize_model(self, use_lightweight_model=True):
         """Initialize the sentence transformer model with fallbacks"""
         try:
-            # Try to import sentence_transformers
-            from sentence_transformers import SentenceTransformer
-            from sklearn.metrics.pairwise import cosine_similarity
-            
-            # Store for later use
-            self.cosine_similarity = cosine_similarity
+            if self.encoder_sockets:
+                self.connect_encoder_server()
+                return
             
             # Try CUDA first if available
             try:
                 import torch
+                self._inference_mode = torch.inference_mode
                 if torch.cuda.is_available():
                     torch.cuda.empty_cache()
                     device = 'cuda'
@@ -66,40 +680,43 @@ class ChatbotUPATIK:
                 else:
                     device = 'cpu'
                     logger.info("CUDA not available, using CPU")
+                    self.runtime_config.update(configure_torch_runtime(
+                        INTRA_OP_THREADS, INTER_OP_THREADS, CPU_AFFINITY
+                    ))
             except ImportError:
                 device = 'cpu'
                 logger.info("PyTorch not available, defaulting to CPU")
+            self.runtime_config["device"] = device
 
-            # Choose model based on memory constraints
-            if use_lightweight_model:
-                model_names = [
-                    'all-MiniLM-L6-v2',  # Smallest model (~90MB)
-                    'paraphrase-MiniLM-L3-v2',  # Even smaller fallback
-                ]
-            else:
-                model_names = [
-                    'paraphrase-multilingual-MiniLM-L12-v2',
-                    'all-MiniLM-L6-v2',  # Fallback
-                ]
-
-            # Try each model in order
-            for model_name in model_names:
+            # Requested profile first, then the fallbacks it declares in the registry
+            requested = self.model_profile
+            for profile in model_fallback_chain(self.model_registry, requested):
+                spec = self.model_registry["models"][profile]
                 try:
-                    logger.info(f"Attempting to load model: {model_name}")
-                    self.model = SentenceTransformer(
-                        model_name,
-                        device=device,
-                        cache_folder='./model_cache'
-                    )
-                    self.model.eval()
-                    logger.info(f"Successfully loaded model: {model_name}")
+                    logger.info(f"Attempting to load model profile {profile}: {spec['name']}")
+                    self.model = load_sentence_model(spec, device)
+                    self.model_profile = profile
+                    logger.info(f"Successfully loaded model: {spec['name']}")
                     break
                 except Exception as e:
-                    logger.warning(f"Failed to load {model_name}: {e}")
+                    logger.warning(f"Failed to load {spec['name']} from {MODEL_CACHE_DIR}: {e}")
                     continue
-            
+
             if self.model is None:
-                raise Exception("Could not load any sentence transformer model")
+                raise Exception(f"Could not load model profile {requested} or its fallbacks from {MODEL_CACHE_DIR}")
+            if self.model_profile != requested:
+                logger.warning(f"Model profile {requested} unavailable, serving with fallback {self.model_profile}")
+            self.runtime_config.update({"model": self.model_profile, "model_requested": requested})
+            # The fallback may need a different share of the budget than the requested profile
+            self.plan_memory()
+
+            if ENCODER_COMPILE != 'none':
+                self.optimize_encoder(ENCODER_COMPILE)
+
+            if RERANKER_MODEL and self.memory_plan["reranker"]:
+                self.load_reranker(RERANKER_MODEL, device)
+            elif RERANKER_MODEL:
+                logger.warning(f"Reranker {RERANKER_MODEL} not loaded: does not fit the memory budget")
                 
             # Generate embeddings
             self.generate_embeddings()
@@ -113,6 +730,133 @@ class ChatbotUPATIK:
             logger.error(f"Failed to initialize model: {e}")
             self.model = None
 
+    def connect_encoder_server(self):
+        """Use the shared encoder processes instead of loading the model in this worker"""
+        from encoder_server import RemoteEncoder
+
+        self.model = RemoteEncoder(self.encoder_sockets)
+        # The encoder server's model decides the embedding space and therefore the threshold
+        if self.model.model_profile in self.model_registry["models"]:
+            self.model_profile = self.model.model_profile
+        self.runtime_config["model"] = self.model.model_profile
+        # Requests from all threads go straight to the encoder server, which batches them
+        self._encode_lock = contextlib.nullcontext()
+        self.runtime_config.update({"device": "remote", "encoder_sockets": self.encoder_sockets})
+        logger.info(f"Connected to encoder server(s): {', '.join(self.encoder_sockets)}")
+        self.plan_memory()
+
+        if RERANKER_MODEL and self.memory_plan["reranker"]:
+            self.load_reranker(RERANKER_MODEL, 'cpu')
+
+        self.generate_embeddings()
+
+    RERANK_PROBE_AFTER = 50  # budget skips before the pair cost is measured again
+
+    def load_reranker(self, model_name, device):
+        """Load the cross-encoder from the local model cache only; reranking stays off on failure"""
+        try:
+            from sentence_transformers import CrossEncoder
+            self.reranker = CrossEncoder(
+                model_name,
+                device=device,
+                cache_folder=MODEL_CACHE_DIR,
+                local_files_only=True
+            )
+            self.runtime_config["reranker"] = model_name
+            # The first call pays for lazy initialization; measure the pair cost on the second
+            pairs = [("contoh pertanyaan", "contoh pertanyaan lain")] * 2
+            with self._inference_mode():
+                self.reranker.predict(pairs, show_progress_bar=False)
+                stage_start = time.perf_counter()
+                self.reranker.predict(pairs, show_progress_bar=False)
+            self._rerank_pair_ms = (time.perf_counter() - stage_start) * 1000 / len(pairs)
+            logger.info(f"Successfully loaded reranker: {model_name} ({self._rerank_pair_ms:.2f} ms per pair)")
+        except Exception as e:
+            logger.warning(f"Failed to load reranker {model_name}, reranking disabled: {e}")
+            self.reranker = None
+
+    def rerank(self, user_input, candidates):
+        """Reorder near-tied top candidates with the cross-encoder, within the latency budget"""
+        # Only candidates that pass their own threshold may be moved up: the winner keeps its
+        # bi-encoder score, so promoting one below its threshold would turn an answer into a fallback
+        top_similarity = candidates[0][1]
+        ambiguous = [c for c in candidates
+                     if top_similarity - c[1] < RERANK_MARGIN and c[1] >= self.row_thresholds[c[0]]]
+        if len(ambiguous) < 2:
+            self.count('rerank_skipped_margin')
+            return candidates
+
+        # Score as many pairs as the budget allows, based on recently observed cost. A stale
+        # estimate (one slow call) would otherwise skip every query, so re-measure now and then
+        probe = self._rerank_budget_skips >= self.RERANK_PROBE_AFTER
+        if self._rerank_pair_ms and not probe:
+            ambiguous = ambiguous[:int(RERANK_BUDGET_MS // self._rerank_pair_ms)]
+            if len(ambiguous) < 2:
+                self._rerank_budget_skips += 1
+                self.count('rerank_skipped_budget')
+                return candidates
+        elif probe:
+            ambiguous = ambiguous[:2]
+
+        pairs = [(user_input, self.df.iloc[idx]['pertanyaan']) for idx, _ in ambiguous]
+        stage_start = time.perf_counter()
+        with self._encode_lock, self._inference_mode():
+            scores = self.reranker.predict(pairs, show_progress_bar=False)
+        pair_ms = (time.perf_counter() - stage_start) * 1000 / len(pairs)
+        if self._rerank_pair_ms is None or probe:
+            self._rerank_pair_ms = pair_ms
+        else:
+            self._rerank_pair_ms = 0.8 * self._rerank_pair_ms + 0.2 * pair_ms
+        self._rerank_budget_skips = 0
+
+        self.count('reranked')
+        reranked = [ambiguous[i] for i in np.argsort(-np.asarray(scores))]
+        scored = {idx for idx, _ in ambiguous}
+        return reranked + [c for c in candidates if c[0] not in scored]
+
+    def optimize_encoder(self, mode):
+        """Swap the transformer for a torch.compile or TorchScript version, keeping eager on failure"""
+        if mode not in ('compile', 'trace'):
+            logger.warning(f"Unknown encoder compile mode: {mode}")
+            return
+
+        transformer, name, original = None, None, None
+        try:
+            import torch
+            transformer = self.model[0]
+            name = transformer_submodule(transformer)
+            original = transformer._modules[name]
+
+            if mode == 'compile':
+                optimized = torch.compile(original, dynamic=True)
+            else:
+                optimized = trace_transformer(original, transformer.tokenize(["contoh pertanyaan untuk tracing"]))
+            setattr(transformer, name, optimized)
+
+            # Warm up so compilation cost is paid at startup, and make sure encode really runs the new module
+            with counting_forward(optimized) as calls:
+                self.encode(["warmup"])
+            if not calls:
+                raise RuntimeError(f"encode() did not call the optimized {name} submodule")
+
+            self.runtime_config["encoder_compile"] = mode
+            logger.info(f"Encoder optimized with mode: {mode}")
+
+        except Exception as e:
+            if original is not None:
+                setattr(transformer, name, original)
+            logger.warning(f"Encoder optimization '{mode}' failed, using eager model: {e}")
+
+    def encode(self, texts, **kwargs):
+        """Encode texts into normalized embeddings under inference mode"""
+        with self._encode_lock, self._inference_mode():
+            return self.model.encode(
+                texts,
+                convert_to_tensor=False,
+                normalize_embeddings=True,
+                **kwargs
+            )
+
     def load_dataset(self):
         """Load dataset from JSON or use default"""
         try:
@@ -690,6 +1434,233 @@ class ChatbotUPATIK:
         self.df = pd.DataFrame(default_data)
         logger.info(f"Default dataset loaded: {len(self.df)} pertanyaan dari {len(self.df['kategori'].unique())} kategori")
 
+    def build_category_index(self):
+        """Group rows by category so every partition is a contiguous block of the index"""
+        self.df = self.df.sort_values('kategori', kind='stable').reset_index(drop=True)
+        self.partitions = {
+            category: slice(int(rows[0]), int(rows[-1]) + 1)
+            for category, rows in self.df.groupby('kategori', sort=False).indices.items()
+        }
+        self.category_lookup = {category.lower(): category for category in self.partitions}
+        self.category_centroids = None
+
+    def resolve_category(self, category):
+        """Map a category hint to its dataset spelling, None if unknown"""
+        if not isinstance(category, str):
+            return None
+        return self.category_lookup.get(category.strip().lower())
+
+    def build_category_centroids(self):
+        """Normalized mean embedding per category, used for pre-routing"""
+        centroids = np.vstack([
+            self.question_embeddings[rows].mean(axis=0, dtype=np.float32) for rows in self.partitions.values()
+        ])
+        self.category_centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    def route_partitions(self, user_embedding, category=None):
+        """Pick the index slices to score: the hinted category, the closest centroids, or everything"""
+        if category is not None:
+            return [self.partitions[category]]
+
+        if self.category_centroids is None or len(self.df) < CENTROID_ROUTING_MIN_ROWS:
+            return [slice(0, len(self.df))]
+
+        centroid_scores = self.category_centroids @ user_embedding[0]
+        partitions = list(self.partitions.values())
+        top = np.argsort(centroid_scores)[::-1][:CENTROID_ROUTING_TOP_K]
+        return [partitions[i] for i in top]
+
+    def similarities(self, query, rows, block=8192):
+        """Cosine similarity of a normalized query to a slice of the (normalized) question embeddings"""
+        embeddings = self.question_embeddings[rows]
+        query = np.asarray(query, dtype=np.float32)
+        if embeddings.dtype == np.float32:
+            return embeddings @ query
+        # Half precision storage: upcast block by block so the temporary copy stays small
+        return np.concatenate([embeddings[i:i + block].astype(np.float32) @ query
+                               for i in range(0, len(embeddings), block)])
+
+    def search_partitions(self, user_embedding, partitions, top_k=1):
+        """Return the top_k (row index, similarity) pairs across the given slices, best first"""
+        candidates = []
+        for rows in partitions:
+            similarities = self.similarities(user_embedding[0], rows)
+            k = min(top_k, len(similarities))
+            for i in np.argpartition(-similarities, k - 1)[:k]:
+                candidates.append((rows.start + int(i), float(similarities[i])))
+        candidates.sort(key=lambda c: c[1], reverse=True)
+        return candidates[:top_k]
+
+    def load_thresholds(self, path):
+        """Resolve a threshold per row (entry, then category, then global) so lookups cost nothing per query"""
+        self.row_thresholds = np.full(len(self.df), self.threshold, dtype=np.float32)
+        self.calibrated_thresholds = {"categories": 0, "entries": 0}
+        if not path or not os.path.exists(path):
+            return
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                calibrated = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading thresholds from {path}: {e}")
+            return
+
+        # Scores from another model live on a different scale
+        if calibrated.get("model") and calibrated["model"] != self.model_profile:
+            logger.warning(f"Ignoring {path}: calibrated for model {calibrated['model']}, "
+                           f"serving {self.model_profile}")
+            return
+
+        if calibrated.get("global") is not None:
+            self.threshold = float(calibrated["global"])
+            self.row_thresholds[:] = self.threshold
+
+        categories = calibrated.get("categories", {})
+        for category, rows in self.partitions.items():
+            if category in categories:
+                self.row_thresholds[rows] = categories[category]
+                self.calibrated_thresholds["categories"] += 1
+
+        # Entries are keyed by normalized question text, which survives reordering the dataset
+        entries = calibrated.get("entries", {})
+        for i, question in enumerate(self.df['pertanyaan']):
+            key = self.preprocess_text(question)
+            if key in entries:
+                self.row_thresholds[i] = entries[key]
+                self.calibrated_thresholds["entries"] += 1
+
+        logger.info(f"Calibrated thresholds loaded from {path}: {self.calibrated_thresholds}")
+
+    def build_answer_payloads(self):
+        """Pre-serialize the static start of every widget response (status, message, category)"""
+        self.answer_payloads = {}
+        self.answer_streams = {}
+        for answer, category in zip(self.df['jawaban'], self.df['kategori']):
+            self.answer_payload(answer, category)
+            self.answer_stream(answer)
+        self.answer_payload(self.FALLBACK_MESSAGE, "Tidak dikenal")
+        self.answer_stream(self.FALLBACK_MESSAGE)
+
+    def answer_payload(self, message, category):
+        """JSON prefix '{"status":"success","message":...,"category":...,' for a response"""
+        key = (message, category)
+        payload = self.answer_payloads.get(key)
+        if payload is None:
+            payload = dumps_bytes({"status": "success", "message": message, "category": category})[:-1] + b','
+            # Only dataset answers and fixed bot messages get here, so the cache stays bounded
+            self.answer_payloads[key] = payload
+        return payload
+
+    def answer_stream(self, message):
+        """Server-sent "chunk" events for a message, split on whitespace"""
+        frames = self.answer_streams.get(message)
+        if frames is None:
+            frames, piece = [], ''
+            for word in re.findall(r'\s*\S+\s*', message) or [message]:
+                piece += word
+                if len(piece) >= STREAM_CHUNK_CHARS:
+                    frames.append(piece)
+                    piece = ''
+            if piece:
+                frames.append(piece)
+            frames = [b"event: chunk\ndata: " + dumps_bytes({"text": text}) + b"\n\n" for text in frames]
+            self.answer_streams[message] = frames
+        return frames
+
+    def build_lexical_index(self, k1=1.5, b=0.75):
+        """BM25 postings over the normalized FAQ questions, for the lexical tier"""
+        documents = [self.preprocess_text(q).split() for q in self.df['pertanyaan']]
+        lengths = np.array([len(d) for d in documents], dtype=np.float32)
+        norms = k1 * (1 - b + b * lengths / max(1.0, lengths.mean()))
+
+        postings = {}
+        for row, words in enumerate(documents):
+            for word, tf in Counter(words).items():
+                postings.setdefault(word, []).append((row, tf))
+
+        n = len(documents)
+        self.lexical_index = {}
+        for word, entries in postings.items():
+            rows = np.array([row for row, _ in entries], dtype=np.int64)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            idf = np.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.lexical_index[word] = (rows, idf * tf * (k1 + 1) / (tf + norms[rows]))
+        self.lexical_vocab = [set(d) for d in documents]
+
+    def cached_result(self, processed_input, category):
+        with self._result_cache_lock:
+            candidates = self.result_cache.get((processed_input, category))
+            if candidates is not None:
+                self.result_cache.move_to_end((processed_input, category))
+        return candidates
+
+    def cache_result(self, processed_input, category, candidates):
+        with self._result_cache_lock:
+            self.result_cache[(processed_input, category)] = candidates
+            self.result_cache.move_to_end((processed_input, category))
+            while len(self.result_cache) > self.memory_plan["result_cache_size"]:
+                self.result_cache.popitem(last=False)
+
+    def build_fast_path(self):
+        """Hash table from normalized FAQ question text to row, answered without encoding"""
+        self.fast_path = {}
+        for i, question in enumerate(self.df['pertanyaan']):
+            key = self.preprocess_text(question)
+            if not key:
+                continue
+            self.fast_path.setdefault(key, i)
+            # Also match questions without their list numbering ("9. Saya mengontrak ...")
+            unnumbered = re.sub(r'^\d+\s+', '', key)
+            if unnumbered:
+                self.fast_path.setdefault(unnumbered, i)
+        logger.info(f"Fast path table built: {len(self.fast_path)} entries")
+
+    def build_spell_corrector(self):
+        """Deletion index over the words of the FAQ questions and answers, the lexicon and the word list"""
+        self.spell_corrector = None
+        if not SPELLING_CORRECTION:
+            return
+
+        from spelling import SpellCorrector, load_lexicon, load_wordlist
+
+        word_counts, abbreviations = load_lexicon(LEXICON_FILE)
+        word_counts.update(load_wordlist(WORDLIST_FILE))
+        # Question wording is closer to how users ask, so it counts more than answer text
+        for question in self.df['pertanyaan']:
+            for word in self.preprocess_text(question).split():
+                word_counts[word] += 3
+        for answer in self.df['jawaban']:
+            word_counts.update(self.preprocess_text(answer).split())
+
+        self.spell_corrector = SpellCorrector(word_counts, abbreviations, max_distance=SPELLING_MAX_DISTANCE,
+                                              cache_size=self.memory_plan["spell_cache_size"])
+        logger.info(f"Spelling index built: {len(word_counts)} words, {len(abbreviations)} abbreviations")
+
+    def normalize_query(self, text):
+        """Preprocessed and spelling-corrected text, as get_response scores it (for offline tools)"""
+        processed = self.preprocess_text(text)
+        if processed and self.spell_corrector is not None:
+            processed, _ = self.spell_corrector.correct(processed)
+        return processed
+
+    def fast_path_lookup(self, processed_input, category=None):
+        """Row of an exact normalized match within the allowed partition, else None"""
+        self.count('fast_path_lookups')
+        match_idx = self.fast_path.get(processed_input)
+        if match_idx is None:
+            return None
+        if category is not None:
+            rows = self.partitions[category]
+            if not rows.start <= match_idx < rows.stop:
+                return None
+        self.count('fast_path_hits')
+        return match_idx
+
+    def count(self, name, n=1):
+        """Increment a request counter"""
+        with self._counter_lock:
+            self.counters[name] += n
+
     def preprocess_text(self, text):
         """Text preprocessing"""
         if not isinstance(text, str) or not text.strip():
@@ -725,6 +1696,32 @@ class ChatbotUPATIK:
 
         return text.strip()
 
+    def load_index(self, path, processed_questions):
+        """Embeddings from a build_index.py artifact, or None when it is missing or built for other data"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as artifact:
+                meta = json.loads(str(artifact['meta']))
+                embeddings = artifact['embeddings']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read index {path}: {e}")
+            return None
+
+        expected = {
+            "model": self.model_profile,
+            "rows": len(processed_questions),
+            "dimension": self.model.get_sentence_embedding_dimension(),
+            "digest": texts_digest(processed_questions)
+        }
+        stale = [key for key, value in expected.items() if meta.get(key) != value]
+        if stale or embeddings.shape != (expected["rows"], expected["dimension"]):
+            logger.warning(f"Index {path} does not match the dataset/model ({', '.join(stale) or 'shape'}), re-encoding")
+            return None
+
+        logger.info(f"Loaded prebuilt index {path}: {embeddings.shape}")
+        return embeddings
+
     def generate_embeddings(self):
         """Generate embeddings for dataset questions"""
         if self.model is None:
@@ -736,15 +1733,17 @@ class ChatbotUPATIK:
         processed_questions = [self.preprocess_text(q) for q in self.df['pertanyaan']]
         
         try:
-            self.question_embeddings = self.model.encode(
-                processed_questions,
-                show_progress_bar=True,
-                batch_size=4,  # Very small batch size
-                convert_to_tensor=False,
-                normalize_embeddings=True
-            )
+            embeddings = self.load_index(INDEX_FILE, processed_questions)
+            if embeddings is None:
+                embeddings = self.encode(
+                    processed_questions,
+                    show_progress_bar=True,
+                    batch_size=4  # Very small batch size
+                )
+            self.question_embeddings = np.asarray(embeddings, dtype=self.memory_plan["embedding_dtype"])
             
             self.processed_questions = processed_questions
+            self.build_category_centroids()
             gc.collect()
             
             logger.info(f"Embeddings generated successfully: {self.question_embeddings.shape}")
@@ -755,82 +1754,190 @@ class ChatbotUPATIK:
             self.question_embeddings = None
             self.processed_questions = processed_questions
 
-    def get_response(self, user_input):
-        """Get response for user input"""
+    def get_response(self, user_input, category=None, session_id=None):
+        """Get response for user input, optionally restricted to one category and using session context"""
         start_time = time.time()
+        timings = {}  # milliseconds per stage
         
+        stage_start = time.perf_counter()
         processed_input = self.preprocess_text(user_input)
+        timings["preprocess"] = round((time.perf_counter() - stage_start) * 1000, 3)
         if not processed_input:
             return self._error_response(user_input, processed_input, "preprocessing_error", start_time)
 
+        # "pasword siakd" -> "password siakad" before the fast path and the encoder see it
+        if self.spell_corrector is not None:
+            stage_start = time.perf_counter()
+            processed_input, corrections = self.spell_corrector.correct(processed_input)
+            timings["spelling"] = round((time.perf_counter() - stage_start) * 1000, 3)
+            self.count('spelling_ms', timings["spelling"])
+            self.count('spelling_queries')
+            if corrections:
+                self.count('spelling_corrected_queries')
+
+        # Exact FAQ questions and greetings skip the transformer entirely
+        match_idx = self.fast_path_lookup(processed_input, category)
+        if match_idx is not None:
+            if session_id and self.question_embeddings is not None:
+                # The matched question stands in for the query embedding we never computed
+                self.sessions.add(session_id, self.question_embeddings[match_idx].astype(np.float32))
+            response = self._success_response(match_idx, 1.0, user_input, processed_input,
+                                              time.time() - start_time, match_type="fast_path", session_id=session_id)
+            response["timings"] = timings
+            return response
+
         # If model is not available, use simple text matching
         if self.model is None or self.question_embeddings is None:
-            return self._simple_text_matching(user_input, processed_input, start_time)
+            return self._simple_text_matching(user_input, processed_input, start_time, category, session_id)
+
+        # Under load, skip the expensive stages instead of queueing for the transformer
+        tier = self.ladder.tier(self.inference_slots.in_flight + self.inference_slots.waiting)
+        self.count(f'tier_{tier}')
+        if tier == "cached":
+            candidates = self.cached_result(processed_input, category)
+            if candidates is not None:
+                self.count('result_cache_hits')
+                response = self._candidates_response(candidates, user_input, processed_input, start_time,
+                                                     "cached", session_id)
+                response["tier"] = "cached"
+                response["timings"] = timings
+                return response
+        if tier in ("cached", "lexical"):
+            response = self._simple_text_matching(user_input, processed_input, start_time, category, session_id)
+            response["timings"] = timings
+            return response
 
+        # Admission: only a bounded number of requests queue for the encoder
+        if not self.inference_slots.acquire():
+            self.count('rejected_overload')
+            raise Overloaded(retry_after=1)
+
+        match_type = "semantic"
+        model_start = time.perf_counter()
         try:
             # Generate embedding user input
-            user_embedding = self.model.encode(
-                [processed_input],
-                convert_to_tensor=False,
-                normalize_embeddings=True
-            )
+            stage_start = time.perf_counter()
+            user_embedding = self.encode([processed_input])
+            timings["encode"] = round((time.perf_counter() - stage_start) * 1000, 3)
+
+            # A paraphrase of a recently answered query reuses its ranking: no search, no rerank
+            stage_start = time.perf_counter()
+            cached = self.semantic_cache.lookup(user_embedding[0], category)
+            timings["semantic_cache"] = round((time.perf_counter() - stage_start) * 1000, 3)
+            if cached is not None:
+                candidates = cached
+                match_type = "semantic_cache"
+                self.count('semantic_cache_hits')
+            else:
+                # Menghitung similarity, hanya pada partisi kategori yang relevan
+                stage_start = time.perf_counter()
+                partitions = self.route_partitions(user_embedding, category)
+                candidates = self.search_partitions(user_embedding, partitions, SEARCH_TOP_K)
+                best_match_idx, best_similarity = candidates[0]
+
+                # Follow-up ("kalau untuk dosen?"): blend in the previous turns' stored embeddings
+                context = self.sessions.context(session_id) if session_id else None
+                if context is not None and best_similarity < self.row_thresholds[best_match_idx]:
+                    blended = (1 - CONTEXT_WEIGHT) * user_embedding[0] + CONTEXT_WEIGHT * context
+                    blended = (blended / np.linalg.norm(blended))[np.newaxis, :]
+                    context_candidates = self.search_partitions(blended, partitions, SEARCH_TOP_K)
+                    if context_candidates[0][1] > best_similarity:
+                        candidates = context_candidates
+                        best_match_idx, best_similarity = candidates[0]
+                        user_embedding = blended
+                        match_type = "context"
+                        self.count('context_matches')
 
-            # Menghitung similarity
-            similarities = self.cosine_similarity(user_embedding, self.question_embeddings)[0]
-            best_match_idx = np.argmax(similarities)
-            best_similarity = similarities[best_match_idx]
+                timings["search"] = round((time.perf_counter() - stage_start) * 1000, 3)
+
+                # Second stage only for ambiguous queries; the winner keeps its bi-encoder score
+                if self.reranker is not None and tier == "full":
+                    stage_start = time.perf_counter()
+                    candidates = self.rerank(user_input, candidates)
+                    if candidates[0][0] != best_match_idx:
+                        self.count('rerank_changed')
+                    best_match_idx, best_similarity = candidates[0]
+                    timings["rerank"] = round((time.perf_counter() - stage_start) * 1000, 3)
+
+            if session_id:
+                self.sessions.add(session_id, user_embedding[0])
+
+            self.ladder.observe((time.perf_counter() - model_start) * 1000)
+            if match_type in ("semantic", "semantic_cache"):
+                # Context matches depend on the session, so only plain results are reusable
+                self.cache_result(processed_input, category, candidates)
+            best_match_idx, best_similarity = candidates[0]
+            answered = best_similarity >= self.row_thresholds[best_match_idx]
+            if match_type == "semantic" and answered and (tier == "full" or self.reranker is None):
+                # Only answered, fully ranked results: a hit never needs the context or rerank stage
+                self.semantic_cache.add(user_embedding[0], category, candidates)
 
         except Exception as e:
             logger.error(f"Error in similarity calculation: {e}")
-            return self._simple_text_matching(user_input, processed_input, start_time)
+            return self._simple_text_matching(user_input, processed_input, start_time, category, session_id)
+        finally:
+            self.inference_slots.release()
 
+        response = self._candidates_response(candidates, user_input, processed_input, start_time,
+                                             match_type, session_id)
+        response["tier"] = tier
+        response["timings"] = timings
+        return response
+
+    def _candidates_response(self, candidates, user_input, processed_input, start_time, match_type, session_id):
+        """Answer or fallback for ranked (row, similarity) candidates, using the row's threshold"""
+        best_match_idx, best_similarity = candidates[0]
         response_time = time.time() - start_time
 
-        if best_similarity >= self.threshold:
-            return self._success_response(best_match_idx, best_similarity, user_input, processed_input, response_time)
+        if best_similarity >= self.row_thresholds[best_match_idx]:
+            response = self._success_response(best_match_idx, best_similarity, user_input, processed_input,
+                                              response_time, match_type=match_type, session_id=session_id)
         else:
-            return self._fallback_response(best_similarity, user_input, processed_input, response_time)
+            response = self._fallback_response(best_similarity, user_input, processed_input, response_time,
+                                               session_id=session_id)
 
-    def _simple_text_matching(self, user_input, processed_input, start_time):
-        """Fallback simple text matching when model is not available"""
-        logger.info("Using simple text matching (model not available)")
-        
-        best_match_idx = 0
-        best_score = 0
-        
-        # Simple keyword matching
-        for i, question in enumerate(self.df['pertanyaan']):
-            processed_question = self.preprocess_text(question)
-            
-            # Count matching words
-            user_words = set(processed_input.split())
-            question_words = set(processed_question.split())
-            
-            if len(question_words) > 0:
-                intersection = len(user_words.intersection(question_words))
-                score = intersection / len(question_words)
-                
-                if score > best_score:
-                    best_score = score
-                    best_match_idx = i
+        response["top_k"] = [[idx, round(similarity, 4)] for idx, similarity in candidates]
+        return response
+
+    def _simple_text_matching(self, user_input, processed_input, start_time, category=None, session_id=None):
+        """Lexical matching (BM25) when the model is not available or the service is degraded"""
+        rows = self.partitions[category] if category is not None else slice(0, len(self.df))
+        user_words = set(processed_input.split())
+
+        # Rank by BM25, then accept on the share of the question's words the query covers
+        scores = np.zeros(len(self.df), dtype=np.float32)
+        for word in user_words:
+            if word in self.lexical_index:
+                word_rows, weights = self.lexical_index[word]
+                scores[word_rows] += weights
+        best_match_idx = rows.start + int(np.argmax(scores[rows]))
+        question_words = self.lexical_vocab[best_match_idx]
+        best_score = len(user_words & question_words) / len(question_words) if question_words else 0.0
 
         response_time = time.time() - start_time
         
         if best_score >= 0.7:  # Lower threshold for simple matching
-            return self._success_response(best_match_idx, best_score, user_input, processed_input, response_time)
+            response = self._success_response(best_match_idx, best_score, user_input, processed_input, response_time,
+                                              match_type="lexical", session_id=session_id)
         else:
-            return self._fallback_response(best_score, user_input, processed_input, response_time)
+            response = self._fallback_response(best_score, user_input, processed_input, response_time,
+                                               session_id=session_id)
+        response["tier"] = "lexical"
+        return response
 
-    def _success_response(self, match_idx, similarity, user_input, processed_input, response_time):
+    def _success_response(self, match_idx, similarity, user_input, processed_input, response_time,
+                          match_type="semantic", session_id=None):
         """Create successful response"""
         response_data = {
             "answer": self.df.iloc[match_idx]['jawaban'],
             "category": self.df.iloc[match_idx]['kategori'],
             "confidence": float(similarity),
             "matched_question": self.df.iloc[match_idx]['pertanyaan'],
+            "matched_id": int(match_idx),
             "original_question": user_input,
             "processed_question": processed_input,
             "status": "success",
+            "match_type": match_type,
             "response_time": response_time
         }
         
@@ -840,15 +1947,18 @@ class ChatbotUPATIK:
             'category': response_data["category"],
             'confidence': float(similarity),
             'status': 'success',
+            'session_id': session_id,
             'response_time': response_time,
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
         
         return response_data
 
-    def _fallback_response(self, similarity, user_input, processed_input, response_time):
+    FALLBACK_MESSAGE = "Maaf, saya belum bisa memahami pertanyaan kamu nih, bisa coba ubah dengan kata lain. Atau Untuk bantuan lebih lanjut, silakan cek informasi di atas klik tentang chatbot (kepala robot)"
+
+    def _fallback_response(self, similarity, user_input, processed_input, response_time, session_id=None):
         """Create fallback response"""
-        fallback_message = "Maaf, saya belum bisa memahami pertanyaan kamu nih, bisa coba ubah dengan kata lain. Atau Untuk bantuan lebih lanjut, silakan cek informasi di atas klik tentang chatbot (kepala robot)"
+        fallback_message = self.FALLBACK_MESSAGE
 
         response_data = {
             "answer": fallback_message,
@@ -866,6 +1976,7 @@ class ChatbotUPATIK:
             'category': 'Tidak dikenal',
             'confidence': float(similarity),
             'status': 'below_threshold',
+            'session_id': session_id,
             'response_time': response_time,
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
@@ -888,17 +1999,72 @@ class ChatbotUPATIK:
 app = Flask(__name__)
 CORS(app)
 
+def encoded_response(body, status=200):
+    """JSON response from serialized bytes, compressed when it is large and the client accepts it"""
+    encoding = None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            body, encoding = brotli.compress(body, quality=5), 'br'
+        elif accepted['gzip']:
+            body, encoding = gzip.compress(body, compresslevel=6), 'gzip'
+
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response, encoding
+
+def create_rate_limiter():
+    """Per-client token bucket limiter, None when rate limiting is disabled"""
+    if RATE_LIMIT_RATE <= 0:
+        return None
+    store = None
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            from rate_limit import RedisBucketStore
+            store = RedisBucketStore(RATE_LIMIT_REDIS_URL)
+        except Exception as e:
+            logger.warning(f"Rate limit store {RATE_LIMIT_REDIS_URL} unavailable, using in-memory buckets: {e}")
+    return TokenBucketLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST, store or MemoryBucketStore())
+
+def client_key(session_id):
+    """Rate limit key for the current request (session_id is None when the client sent none)"""
+    # A server-issued id would give every such request a fresh bucket, so those are keyed by IP
+    if RATE_LIMIT_KEY == 'session' and session_id:
+        return f"session:{session_id}"
+    address = request.access_route[0] if TRUST_PROXY and request.access_route else request.remote_addr
+    return f"ip:{address or 'unknown'}"
+
+def retry_response(message, status, retry_after):
+    """Fast rejection with a Retry-After header (whole seconds)"""
+    retry_after = max(1, int(np.ceil(retry_after)))
+    response = jsonify({"error": message, "status": "error", "retry_after": retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+rate_limiter = create_rate_limiter()
+
 # Global chatbot instance
 chatbot = None
 chatbot_status = {"ready": False, "error": None}
+interaction_log = None
 
 def initialize_chatbot_async():
     """Initialize chatbot in background thread"""
-    global chatbot, chatbot_status
+    global chatbot, chatbot_status, interaction_log
     
     try:
         logger.info("Starting chatbot initialization in background...")
         chatbot_status = {"ready": False, "error": None}
+
+        if INTERACTION_LOG_DIR and interaction_log is None:
+            from interaction_log import InteractionLogger
+            interaction_log = InteractionLogger(
+                INTERACTION_LOG_DIR,
+                max_file_bytes=int(INTERACTION_LOG_MAX_MB * 1024 * 1024)
+            )
+            atexit.register(interaction_log.close)
         
         # Check if dataset.json exists
         json_path = "dataset.json" if os.path.exists("dataset.json") else None
@@ -918,6 +2084,32 @@ def initialize_chatbot_async():
         chatbot_status = {"ready": False, "error": error_msg}
         chatbot = None
 
+_init_lock = threading.Lock()
+_init_pid = None
+
+def start_chatbot_initialization():
+    """Start initialize_chatbot_async in a background thread, once per process (forked workers included)"""
+    global _init_pid
+    # Checked on every request, so the common case takes no lock
+    if chatbot is not None or _init_pid == os.getpid():
+        return
+    with _init_lock:
+        # A worker forked after the parent started loading inherits the flag but not the thread
+        if chatbot is not None or _init_pid == os.getpid():
+            return
+        _init_pid = os.getpid()
+    threading.Thread(target=initialize_chatbot_async, daemon=True).start()
+
+def create_app():
+    """WSGI factory (gunicorn 'server:create_app()'): starts loading the chatbot when the worker boots"""
+    start_chatbot_initialization()
+    return app
+
+@app.before_request
+def ensure_chatbot_initialization():
+    # Under a WSGI server importing server:app the __main__ block never runs; the first request starts loading
+    start_chatbot_initialization()
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -930,71 +2122,189 @@ def health_check():
         "chatbot_error": chatbot_status["error"]
     })
 
+def parse_chat_request():
+    """Validate a chat request, returns ((message, category, session_id), None) or (None, error response)"""
+    # Check if chatbot is ready
+    if not chatbot_status["ready"]:
+        if chatbot_status["error"]:
+            error_msg = f"Chatbot tidak tersedia: {chatbot_status['error']}"
+        else:
+            error_msg = "Chatbot masih dalam proses inisialisasi. Silakan tunggu beberapa saat."
+        
+        return None, (jsonify({
+            "error": error_msg,
+            "status": "error",
+            "chatbot_ready": False
+        }), 503)
+
+    # Validate request
+    if not request.is_json:
+        return None, (jsonify({
+            "error": "Content-Type harus application/json",
+            "status": "error"
+        }), 400)
+
+    data = request.get_json()
+    
+    if not data or 'message' not in data:
+        return None, (jsonify({
+            "error": "Field 'message' diperlukan", 
+            "status": "error"
+        }), 400)
+
+    user_message = data['message'].strip()
+    
+    if not user_message:
+        return None, (jsonify({
+            "error": "Pesan tidak boleh kosong",
+            "status": "error"
+        }), 400)
+
+    # Optional category hint from the widget
+    category = None
+    if data.get('category'):
+        category = chatbot.resolve_category(data['category'])
+        if category is None:
+            return None, (jsonify({
+                "error": f"Kategori tidak dikenal: {data['category']}",
+                "categories": list(chatbot.partitions),
+                "status": "error"
+            }), 400)
+
+    # Session id keeps follow-up questions in context; issue one if the widget has none yet
+    sent_session_id = data.get('session_id')
+    session_id = sent_session_id or uuid.uuid4().hex
+    if not isinstance(session_id, str) or len(session_id) > 64:
+        return None, (jsonify({
+            "error": "Field 'session_id' tidak valid",
+            "status": "error"
+        }), 400)
+
+    if rate_limiter is not None:
+        allowed, retry_after = rate_limiter.acquire(client_key(sent_session_id))
+        if not allowed:
+            chatbot.count('rejected_rate_limit')
+            return None, retry_response("Terlalu banyak permintaan. Silakan coba lagi sebentar lagi.", 429,
+                                        retry_after)
+
+    return (user_message, category, session_id), None
+
+def log_interaction(user_message, response, category, session_id):
+    """Queue one interaction record (non-blocking, the writer thread batches records to disk)"""
+    if interaction_log is not None:
+        interaction_log.log({
+            "timestamp": datetime.now().isoformat(timespec='milliseconds'),
+            "session_id": session_id,
+            "category_hint": category,
+            "query": user_message,
+            "processed_query": response["processed_question"],
+            "status": response["status"],
+            "match_type": response.get("match_type"),
+            "tier": response.get("tier"),
+            "matched_id": response.get("matched_id"),
+            "score": round(response["confidence"], 4),
+            "top_k": response.get("top_k", []),
+            "timings_ms": response.get("timings", {}),
+            "response_time_ms": round(response["response_time"] * 1000, 3)
+        })
+
 # Main chat endpoint
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint"""
     try:
-        # Check if chatbot is ready
-        if not chatbot_status["ready"]:
-            if chatbot_status["error"]:
-                error_msg = f"Chatbot tidak tersedia: {chatbot_status['error']}"
-            else:
-                error_msg = "Chatbot masih dalam proses inisialisasi. Silakan tunggu beberapa saat."
-            
-            return jsonify({
-                "error": error_msg,
-                "status": "error",
-                "chatbot_ready": False
-            }), 503
+        params, error = parse_chat_request()
+        if error is not None:
+            return error
+        user_message, category, session_id = params
 
-        # Validate request
-        if not request.is_json:
-            return jsonify({
-                "error": "Content-Type harus application/json",
-                "status": "error"
-            }), 400
+        logger.debug(f"Received message: {user_message}")
 
-        data = request.get_json()
-        
-        if not data or 'message' not in data:
-            return jsonify({
-                "error": "Field 'message' diperlukan", 
-                "status": "error"
-            }), 400
+        # Process with chatbot
+        response = chatbot.get_response(user_message, category=category, session_id=session_id)
 
-        user_message = data['message'].strip()
-        
-        if not user_message:
-            return jsonify({
-                "error": "Pesan tidak boleh kosong",
-                "status": "error"
-            }), 400
+        # Format response: pre-serialized message/category plus the per-request fields
+        serialize_start = time.perf_counter()
+        body = chatbot.answer_payload(response["answer"], response["category"]) + dumps_bytes({
+            "confidence": round(response["confidence"], 3),
+            "response_time": round(response["response_time"], 3),
+            "session_id": session_id,
+            "tier": response.get("tier"),
+            "timestamp": current_timestamp()
+        })[1:]
+        serialize_us = (time.perf_counter() - serialize_start) * 1e6
+        http_response, encoding = encoded_response(body)
 
-        logger.info(f"Received message: {user_message}")
+        logger.debug(f"Response sent: {response['status']} - confidence: {response['confidence']:.3f}")
 
-        # Process with chatbot
-        response = chatbot.get_response(user_message)
+        log_interaction(user_message, response, category, session_id)
+
+        chatbot.count('payload_responses')
+        chatbot.count('serialize_us', serialize_us)
+        chatbot.count('payload_bytes', len(body))
+        chatbot.count('wire_bytes', len(http_response.get_data()))
+        if encoding:
+            chatbot.count(f'compressed_{encoding}')
+
+        return http_response
+
+    except Overloaded as e:
+        return retry_response("Server sedang sibuk. Silakan coba lagi sebentar lagi.", 503, e.retry_after)
+
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {e}")
+        return jsonify({
+            "error": "Terjadi kesalahan server internal",
+            "status": "error", 
+            "message": "Maaf, terjadi kesalahan. Silakan coba lagi atau hubungi helpdesk.",
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }), 500
 
-        # Format response
-        widget_response = {
+# Streaming chat endpoint (server-sent events)
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same request as /api/chat; sends a "meta" event right after retrieval, then the answer in "chunk" events"""
+    try:
+        params, error = parse_chat_request()
+        if error is not None:
+            return error
+        user_message, category, session_id = params
+
+        logger.debug(f"Received message (stream): {user_message}")
+
+        response = chatbot.get_response(user_message, category=category, session_id=session_id)
+        log_interaction(user_message, response, category, session_id)
+        chatbot.count('stream_responses')
+
+        meta = b"event: meta\ndata: " + dumps_bytes({
             "status": "success",
-            "message": response["answer"],
             "category": response["category"],
             "confidence": round(response["confidence"], 3),
             "response_time": round(response["response_time"], 3),
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+            "session_id": session_id,
+            "tier": response.get("tier"),
+            "timestamp": current_timestamp()
+        }) + b"\n\n"
+        frames = chatbot.answer_stream(response["answer"])
 
-        logger.info(f"Response sent: {response['status']} - confidence: {response['confidence']:.3f}")
-        
-        return jsonify(widget_response)
+        def events():
+            yield meta
+            yield from frames
+            yield b"event: done\ndata: {}\n\n"
+
+        return Response(events(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # keep nginx from buffering the stream
+        })
+
+    except Overloaded as e:
+        return retry_response("Server sedang sibuk. Silakan coba lagi sebentar lagi.", 503, e.retry_after)
 
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.error(f"Error in chat stream endpoint: {e}")
         return jsonify({
             "error": "Terjadi kesalahan server internal",
-            "status": "error", 
+            "status": "error",
             "message": "Maaf, terjadi kesalahan. Silakan coba lagi atau hubungi helpdesk.",
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }), 500
@@ -1007,10 +2317,12 @@ def get_stats():
         if not chatbot_status["ready"] or chatbot is None:
             return jsonify({"error": "Chatbot belum siap"}), 503
 
-        total_conversations = len(chatbot.conversation_history)
-        successful_responses = len([h for h in chatbot.conversation_history if h['status'] == 'success'])
-        avg_confidence = np.mean([h['confidence'] for h in chatbot.conversation_history]) if chatbot.conversation_history else 0
-        avg_response_time = np.mean([h['response_time'] for h in chatbot.conversation_history]) if chatbot.conversation_history else 0
+        # Request threads append while this runs; iterating the deque itself can raise
+        history = list(chatbot.conversation_history)
+        total_conversations = len(history)
+        successful_responses = len([h for h in history if h['status'] == 'success'])
+        avg_confidence = np.mean([h['confidence'] for h in history]) if history else 0
+        avg_response_time = np.mean([h['response_time'] for h in history]) if history else 0
 
         stats = {
             "total_conversations": total_conversations,
@@ -1020,8 +2332,74 @@ def get_stats():
             "average_response_time": round(avg_response_time, 3),
             "dataset_size": len(chatbot.df),
             "categories": list(chatbot.df['kategori'].unique()),
+            "partition_sizes": {c: rows.stop - rows.start for c, rows in chatbot.partitions.items()},
+            "centroid_routing": len(chatbot.df) >= CENTROID_ROUTING_MIN_ROWS,
+            "fast_path": {
+                "entries": len(chatbot.fast_path),
+                "lookups": chatbot.counters['fast_path_lookups'],
+                "hits": chatbot.counters['fast_path_hits'],
+                "hit_rate": round(chatbot.counters['fast_path_hits'] / chatbot.counters['fast_path_lookups'], 3)
+                            if chatbot.counters['fast_path_lookups'] else 0
+            },
             "threshold": chatbot.threshold,
-            "model_available": chatbot.model is not None
+            "calibrated_thresholds": chatbot.calibrated_thresholds,
+            "model_available": chatbot.model is not None,
+            "runtime": chatbot.runtime_config,
+            "memory": {
+                "usage_mb": chatbot.memory_usage(),
+                "plan": chatbot.memory_plan
+            },
+            "sessions": chatbot.sessions.stats(),
+            "context_matches": chatbot.counters['context_matches'],
+            "interaction_log": interaction_log.stats if interaction_log is not None else None,
+            "spelling": {
+                "enabled": chatbot.spell_corrector is not None,
+                "queries": chatbot.counters['spelling_queries'],
+                "corrected_queries": chatbot.counters['spelling_corrected_queries'],
+                "avg_ms": round(chatbot.counters['spelling_ms'] / chatbot.counters['spelling_queries'], 3)
+                          if chatbot.counters['spelling_queries'] else 0,
+                **(dict(chatbot.spell_corrector.stats) if chatbot.spell_corrector is not None else {})
+            },
+            "stream_responses": chatbot.counters['stream_responses'],
+            "degradation": {
+                **chatbot.ladder.stats(),
+                "served": {tier: chatbot.counters[f'tier_{tier}'] for tier in DegradationLadder.TIERS},
+                "result_cache": {"entries": len(chatbot.result_cache), "hits": chatbot.counters['result_cache_hits']}
+            },
+            "semantic_cache": chatbot.semantic_cache.stats(),
+            "admission": {
+                "rate_limit": {
+                    "enabled": rate_limiter is not None,
+                    "rate": RATE_LIMIT_RATE,
+                    "burst": RATE_LIMIT_BURST,
+                    "key": RATE_LIMIT_KEY,
+                    "backend": rate_limiter.store.backend if rate_limiter is not None else None,
+                    "tracked_clients": len(rate_limiter.store) if rate_limiter is not None else 0
+                },
+                "max_concurrent_inference": chatbot.inference_slots.max_concurrent,
+                "in_flight": chatbot.inference_slots.in_flight,
+                "waiting": chatbot.inference_slots.waiting,
+                "rejected_rate_limit": chatbot.counters['rejected_rate_limit'],
+                "rejected_overload": chatbot.counters['rejected_overload']
+            },
+            "payloads": {
+                "encoder": "orjson" if orjson is not None else "json",
+                "responses": chatbot.counters['payload_responses'],
+                "avg_serialize_us": round(chatbot.counters['serialize_us'] / chatbot.counters['payload_responses'], 2)
+                                    if chatbot.counters['payload_responses'] else 0,
+                "payload_bytes": chatbot.counters['payload_bytes'],
+                "wire_bytes": chatbot.counters['wire_bytes'],
+                "compressed": {"gzip": chatbot.counters['compressed_gzip'], "br": chatbot.counters['compressed_br']},
+                "brotli_available": brotli is not None
+            },
+            "reranker": {
+                "enabled": chatbot.reranker is not None,
+                "reranked": chatbot.counters['reranked'],
+                "changed_top1": chatbot.counters['rerank_changed'],
+                "skipped_margin": chatbot.counters['rerank_skipped_margin'],
+                "skipped_budget": chatbot.counters['rerank_skipped_budget'],
+                "pair_ms": round(chatbot._rerank_pair_ms, 3) if chatbot._rerank_pair_ms else None
+            }
         }
 
         return jsonify(stats)
@@ -1033,12 +2411,21 @@ def get_stats():
 # Reset endpoint
 @app.route('/api/reset', methods=['POST'])
 def reset_history():
-    """Reset conversation history"""
+    """Reset conversation history, or only one session's context when session_id is given"""
     try:
         if not chatbot_status["ready"] or chatbot is None:
             return jsonify({"error": "Chatbot belum siap"}), 503
+
+        data = request.get_json(silent=True) or {}
+        if data.get('session_id'):
+            chatbot.sessions.clear(data['session_id'])
+            return jsonify({
+                "status": "success",
+                "message": "Konteks sesi telah direset"
+            })
             
         chatbot.conversation_history.clear()
+        chatbot.sessions.clear()
         return jsonify({
             "status": "success", 
             "message": "Conversation history telah direset"
@@ -1070,15 +2457,17 @@ def internal_error(error):
     }), 500
 
 if __name__ == '__main__':
+    from werkzeug.serving import WSGIRequestHandler
+
     logger.info("Starting Chatbot UPA TIK API Server...")
     
     # Start chatbot initialization in background thread
-    init_thread = threading.Thread(target=initialize_chatbot_async)
-    init_thread.daemon = True
-    init_thread.start()
+    start_chatbot_initialization()
     
     # Start Flask server immediately
     logger.info("Server starting... Chatbot will be available shortly.")
+    # Keep-alive, so the widget reuses its connection after a streamed answer
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(
         host='0.0.0.0',
         port=5000,
@@ -0,0 +1,159 @@
+"""
+Spelling correction and abbreviation expansion for Indonesian queries.
+
+SymSpell-style: every vocabulary word's deletions (up to max_distance, on
+its first prefix_length characters) are indexed up front, so correcting a
+token only needs the token's own deletions plus a few dictionary lookups
+instead of a scan over the vocabulary. Corrections are cached per token.
+"""
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Lexicon entries are curated, so they outrank words seen a few times in the FAQ answers
+LEXICON_WEIGHT = 10
+# General words are only there so everyday Indonesian is left alone; FAQ words win any tie
+WORDLIST_WEIGHT = 1
+
+
+def osa_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def load_lexicon(path):
+    """Read extra vocabulary words and "abbreviation=expansion" lines"""
+    words, abbreviations = Counter(), {}
+    if not path or not os.path.exists(path):
+        return words, abbreviations
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().lower()
+            if not line or line.startswith('#'):
+                continue
+            if '=' in line:
+                short, expansion = (part.strip() for part in line.split('=', 1))
+                abbreviations[short] = expansion
+                for word in expansion.split():
+                    words[word] += LEXICON_WEIGHT
+            else:
+                words[line] += LEXICON_WEIGHT
+    return words, abbreviations
+
+
+def load_wordlist(path):
+    """Read a general word list (one word per line), each counted WORDLIST_WEIGHT"""
+    words = Counter()
+    if not path or not os.path.exists(path):
+        return words
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().lower()
+            if line and not line.startswith('#'):
+                words[line] = WORDLIST_WEIGHT
+    return words
+
+
+class SpellCorrector:
+    """Corrects tokens against a vocabulary with a precomputed deletion index"""
+
+    def __init__(self, word_counts, abbreviations=None, max_distance=2, prefix_length=7,
+                 min_token_length=3, long_token_length=8, cache_size=20000):
+        self.words = dict(word_counts)
+        self.abbreviations = abbreviations or {}
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_token_length = min_token_length
+        self.long_token_length = long_token_length
+        self.cache_size = cache_size
+        self.cache = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+        self.deletes = defaultdict(list)
+        for word in self.words:
+            for variant in self._deletes(word[:prefix_length], max_distance):
+                self.deletes[variant].append(word)
+
+    @staticmethod
+    def _deletes(word, max_distance):
+        """The word and every string reachable from it by up to max_distance deletions"""
+        result = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+            result |= frontier
+        return result
+
+    def _lookup(self, token):
+        # Below long_token_length one or two edits often turn an ordinary word into another
+        # ("sakit" -> "wakil", "ikan" -> "akan"), so short tokens are only completed by one
+        # missing letter ("bayr" -> "bayar"), never changed
+        short = len(token) < self.long_token_length
+        max_distance = 1 if short else self.max_distance
+        candidates = set()
+        for variant in self._deletes(token[:self.prefix_length], max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+
+        best, best_key = token, None
+        for candidate in candidates:
+            if short and len(candidate) != len(token) + 1:
+                continue
+            distance = osa_distance(token, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self.words[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def correct_token(self, token):
+        """Expansion or closest vocabulary word for token (itself when nothing is close)"""
+        if token in self.abbreviations:
+            self.stats["expanded"] += 1
+            return self.abbreviations[token]
+        if token in self.words or len(token) < self.min_token_length or not token.isalpha():
+            return token
+
+        with self._lock:
+            corrected = self.cache.get(token)
+        if corrected is not None:
+            self.stats["cache_hits"] += 1
+        else:
+            corrected = self._lookup(token)
+            with self._lock:
+                if len(self.cache) >= self.cache_size:
+                    # Evict the oldest entry (dicts keep insertion order)
+                    self.cache.pop(next(iter(self.cache)))
+                self.cache[token] = corrected
+
+        if corrected != token:
+            self.stats["corrected"] += 1
+        return corrected
+
+    def correct(self, text):
+        """Correct every token of a preprocessed text, returns (text, number of tokens changed)"""
+        tokens = text.split()
+        corrected = [self.correct_token(token) for token in tokens]
+        self.stats["tokens"] += len(tokens)
+        changed = sum(1 for a, b in zip(tokens, corrected) if a != b)
+        return ' '.join(corrected), changed
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from build_index import prepare_work_dir
+
+MANIFEST = {"model": "m", "rows": 2, "dimension": 4, "digest": "abc", "shard_size": 1}
+
+
+def test_creates_work_dir_with_manifest(tmp_path):
+    work_dir = tmp_path / "build"
+    prepare_work_dir(str(work_dir), MANIFEST, force=False)
+    assert json.loads((work_dir / "manifest.json").read_text()) == MANIFEST
+
+
+def test_keeps_checkpoints_of_the_same_build(tmp_path):
+    prepare_work_dir(str(tmp_path), MANIFEST, force=False)
+    (tmp_path / "shard-00000.npy").write_bytes(b"x")
+    prepare_work_dir(str(tmp_path), MANIFEST, force=False)
+    assert (tmp_path / "shard-00000.npy").exists()
+
+
+def test_clears_checkpoints_of_another_build_or_when_forced(tmp_path):
+    prepare_work_dir(str(tmp_path), MANIFEST, force=False)
+    (tmp_path / "shard-00000.npy").write_bytes(b"x")
+    prepare_work_dir(str(tmp_path), dict(MANIFEST, rows=3), force=False)
+    assert os.listdir(tmp_path) == ["manifest.json"]
+
+    (tmp_path / "shard-00000.npy").write_bytes(b"x")
+    prepare_work_dir(str(tmp_path), dict(MANIFEST, rows=3), force=True)
+    assert os.listdir(tmp_path) == ["manifest.json"]
+
+
+def test_refuses_a_directory_with_other_files(tmp_path):
+    (tmp_path / "dataset.json").write_text("[]")
+    with pytest.raises(SystemExit):
+        prepare_work_dir(str(tmp_path), MANIFEST, force=True)
+    assert (tmp_path / "dataset.json").exists()
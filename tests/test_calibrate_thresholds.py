@@ -0,0 +1,43 @@
+import numpy as np
+
+from calibrate_thresholds import calibrate_groups, evaluate
+
+GRID = np.round(np.arange(0.3, 1.0 + 1e-9, 0.05), 4)
+
+
+def test_group_threshold_separates_correct_from_wrong_matches():
+    scores = np.array([0.9, 0.85, 0.8, 0.5, 0.45])
+    correct = np.array([True, True, True, False, False])
+    groups = np.zeros(5, dtype=np.int64)
+    best = calibrate_groups(groups, 1, np.array([0, 0, 0, -1, -1]), scores, correct, GRID, 0.5, 1)
+    assert 0.5 < best[0] <= 0.8
+
+
+def test_group_with_positives_but_no_true_positives_rejects_its_wrong_matches():
+    # Entry 0's own queries were all predicted as entry 1, while 6 wrong queries matched entry 0
+    predicted = np.array([1, 1, 0, 0, 0, 0, 0, 0])
+    labels = np.array([0, 0, -1, -1, 1, 1, -1, -1])
+    scores = np.array([0.8, 0.75, 0.5, 0.55, 0.6, 0.62, 0.4, 0.45])
+    correct = predicted == labels
+    best = calibrate_groups(predicted, 2, labels, scores, correct, GRID, 0.5, 1)
+    assert best[0] > 0.62
+    assert best[0] == GRID[np.argmax(GRID > 0.62)]
+
+
+def test_group_without_positives_rejects_all_its_matches():
+    scores = np.array([0.6, 0.7])
+    best = calibrate_groups(np.zeros(2, dtype=np.int64), 1, np.array([-1, -1]), scores,
+                            np.array([False, False]), GRID, 0.5, 1)
+    assert best[0] == 0.75
+
+
+def test_small_groups_inherit():
+    best = calibrate_groups(np.array([0, 1, 1]), 3, np.array([0, 1, 1]), np.array([0.9, 0.9, 0.8]),
+                            np.array([True, True, True]), GRID, 0.5, 2)
+    assert np.isnan(best[0]) and np.isnan(best[2]) and not np.isnan(best[1])
+
+
+def test_evaluate():
+    report = evaluate(np.array([0.9, 0.8, 0.6]), np.array([True, False, True]),
+                      np.array([True, True, True]), np.full(3, 0.7))
+    assert report == {"precision": 0.5, "recall": 0.3333, "f1": 0.4, "accepted": 2}
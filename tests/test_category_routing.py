@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+import server
+
+ROWS = [
+    ("Keuangan", "cara bayar ukt"),
+    ("Akademik", "lupa password siakad"),
+    ("Keuangan", "jadwal pembayaran ukt"),
+    ("Layanan", "cara daftar wifi kampus"),
+    ("Akademik", "cara cetak krs"),
+]
+
+
+@pytest.fixture
+def bot(tmp_path):
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps([{"kategori": c, "pertanyaan": q, "jawaban": f"jawab {q}"} for c, q in ROWS]))
+    return server.ChatbotUPATIK(json_file_path=str(path), load_model=False)
+
+
+def with_embeddings(bot):
+    # One axis per category, so every question is closest to its own centroid
+    axes = {"Akademik": 0, "Keuangan": 1, "Layanan": 2}
+    embeddings = np.zeros((len(bot.df), 3), dtype=np.float32)
+    for i, category in enumerate(bot.df['kategori']):
+        embeddings[i, axes[category]] = 1.0
+    bot.question_embeddings = embeddings
+    bot.build_category_centroids()
+    return bot
+
+
+def test_partitions_are_contiguous_blocks(bot):
+    assert list(bot.partitions) == ["Akademik", "Keuangan", "Layanan"]
+    for category, rows in bot.partitions.items():
+        assert set(bot.df['kategori'][rows]) == {category}
+    assert sum(rows.stop - rows.start for rows in bot.partitions.values()) == len(ROWS)
+    # Rows keep their dataset order inside a partition
+    assert list(bot.df['pertanyaan'][bot.partitions["Keuangan"]]) == ["cara bayar ukt", "jadwal pembayaran ukt"]
+
+
+def test_category_hint_is_case_insensitive(bot):
+    assert bot.resolve_category("keuangan") == "Keuangan"
+    assert bot.resolve_category("  AKADEMIK ") == "Akademik"
+    assert bot.resolve_category("Olahraga") is None
+    assert bot.resolve_category(3) is None
+
+
+def test_unknown_category_hint_is_rejected(bot, monkeypatch):
+    monkeypatch.setattr(server, 'chatbot', bot)
+    monkeypatch.setattr(server, 'rate_limiter', None)
+    monkeypatch.setitem(server.chatbot_status, 'ready', True)
+    with server.app.test_request_context('/api/chat', method='POST',
+                                         json={"message": "halo", "category": "Olahraga"}):
+        parsed, error = server.parse_chat_request()
+    response, status = error
+    assert parsed is None and status == 400
+    assert response.get_json()["categories"] == ["Akademik", "Keuangan", "Layanan"]
+
+
+def test_hint_restricts_search_to_its_partition(bot):
+    with_embeddings(bot)
+    query = np.array([[1.0, 0.0, 0.0]], dtype=np.float32)
+    assert bot.route_partitions(query, "Layanan") == [bot.partitions["Layanan"]]
+    best = bot.search_partitions(query, bot.route_partitions(query, "Layanan"))
+    assert bot.df['kategori'][best[0][0]] == "Layanan"
+
+
+def test_small_corpus_scores_everything(bot, monkeypatch):
+    monkeypatch.setattr(server, 'CENTROID_ROUTING_MIN_ROWS', len(ROWS) + 1)
+    with_embeddings(bot)
+    query = np.array([[0.0, 1.0, 0.0]], dtype=np.float32)
+    assert bot.route_partitions(query) == [slice(0, len(ROWS))]
+
+
+def test_large_corpus_routes_to_closest_centroids(bot, monkeypatch):
+    monkeypatch.setattr(server, 'CENTROID_ROUTING_MIN_ROWS', 1)
+    monkeypatch.setattr(server, 'CENTROID_ROUTING_TOP_K', 2)
+    with_embeddings(bot)
+    query = np.array([[0.0, 0.8, 0.6]], dtype=np.float32)
+    assert bot.route_partitions(query) == [bot.partitions["Keuangan"], bot.partitions["Layanan"]]
+    np.testing.assert_allclose(np.linalg.norm(bot.category_centroids, axis=1), 1.0)
@@ -0,0 +1,99 @@
+import gzip
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+SHORT = 'Hubungi "helpdesk" di\nlptik@unja.ac.id — é </script>'
+LONG = "Langkah pembayaran UKT: " + "buka portal, pilih tagihan, bayar lewat bank mitra. " * 40
+
+
+@pytest.fixture(params=["orjson", "json"])
+def client(request, tmp_path, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(server, 'orjson', None)
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps([
+        {"kategori": "Layanan", "pertanyaan": "kontak helpdesk", "jawaban": SHORT},
+        {"kategori": "Keuangan", "pertanyaan": "cara bayar ukt", "jawaban": LONG},
+    ]))
+    bot = server.ChatbotUPATIK(json_file_path=str(path), load_model=False)
+    monkeypatch.setattr(server, 'chatbot', bot)
+    monkeypatch.setattr(server, 'rate_limiter', None)
+    monkeypatch.setattr(server, 'interaction_log', None)
+    monkeypatch.setitem(server.chatbot_status, 'ready', True)
+    return server.app.test_client()
+
+
+def widget_json(body):
+    """What the endpoint used to return with jsonify, rebuilt from the decoded dynamic fields"""
+    with server.app.app_context():
+        return json.loads(server.jsonify({
+            "status": "success",
+            "message": body["message"],
+            "category": body["category"],
+            "confidence": body["confidence"],
+            "response_time": body["response_time"],
+            "session_id": body["session_id"],
+            "tier": body["tier"],
+            "timestamp": body["timestamp"]
+        }).get_data())
+
+
+@pytest.mark.parametrize("question, answer, category", [
+    ("kontak helpdesk", SHORT, "Layanan"),
+    ("cara bayar ukt", LONG, "Keuangan"),
+    ("pertanyaan yang tidak ada hubungannya", server.ChatbotUPATIK.FALLBACK_MESSAGE, "Tidak dikenal"),
+])
+def test_payload_decodes_like_jsonify(client, question, answer, category):
+    response = client.post('/api/chat', json={"message": question, "session_id": "s1"})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    body = json.loads(response.get_data())
+    assert body == widget_json(body)
+    assert body["message"] == answer and body["category"] == category
+    assert body["session_id"] == "s1"
+    assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d", body["timestamp"])
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.post('/api/chat', json={"message": "kontak helpdesk"}, headers={"Accept-Encoding": "gzip, br"})
+    assert len(response.get_data()) < server.COMPRESS_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_large_responses_are_gzipped_when_accepted(client, monkeypatch):
+    monkeypatch.setattr(server, 'brotli', None)
+    response = client.post('/api/chat', json={"message": "cara bayar ukt"}, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data()))["message"] == LONG
+
+
+def test_large_responses_stay_plain_without_accept_encoding(client):
+    response = client.post('/api/chat', json={"message": "cara bayar ukt"}, headers={"Accept-Encoding": "identity"})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.get_data())["message"] == LONG
+
+
+def test_br_is_preferred_when_brotli_is_installed(client, monkeypatch):
+    compressed = []
+    fake_brotli = SimpleNamespace(compress=lambda body, quality: compressed.append(body) or b"br:" + body)
+    monkeypatch.setattr(server, 'brotli', fake_brotli)
+
+    response = client.post('/api/chat', json={"message": "cara bayar ukt"}, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_data() == b"br:" + compressed[0]
+
+    response = client.post('/api/chat', json={"message": "cara bayar ukt"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_threshold_is_configurable(client, monkeypatch):
+    monkeypatch.setattr(server, 'COMPRESS_MIN_BYTES', 10)
+    response = client.post('/api/chat', json={"message": "kontak helpdesk"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data()))["message"] == SHORT
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import server
+
+ANSWER = ("1. Login ke Elista menggunakan akun mahasiswa.\n2. Pilih menu Bimbingan, lalu  sub-menu Agenda.\n"
+          "3. Rekap tampil lengkap: https://elista.unja.ac.id/mahasiswa/bimbingan/agenda/rekap-semua-semester")
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps([{"kategori": "Akademik", "pertanyaan": "rekap bimbingan", "jawaban": ANSWER}]))
+    bot = server.ChatbotUPATIK(json_file_path=str(path), load_model=False)
+    monkeypatch.setattr(server, 'chatbot', bot)
+    monkeypatch.setattr(server, 'rate_limiter', None)
+    monkeypatch.setattr(server, 'interaction_log', None)
+    monkeypatch.setitem(server.chatbot_status, 'ready', True)
+    return bot
+
+
+def parse_events(body):
+    """[(event, data)] from an SSE body; every event is exactly one event line and one data line"""
+    assert body.endswith(b"\n\n")
+    events = []
+    for block in body[:-2].split(b"\n\n"):
+        event_line, data_line = block.split(b"\n")
+        assert event_line.startswith(b"event: ") and data_line.startswith(b"data: ")
+        events.append((event_line[7:].decode(), json.loads(data_line[6:])))
+    return events
+
+
+def test_stream_sends_meta_chunks_then_done(bot):
+    response = server.app.test_client().post('/api/chat/stream', json={"message": "rekap bimbingan",
+                                                                        "session_id": "s1"})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+
+    events = parse_events(response.get_data())
+    names = [name for name, _ in events]
+    assert names[0] == "meta" and names[-1] == "done"
+    assert set(names[1:-1]) == {"chunk"} and len(names) > 3
+
+    meta = events[0][1]
+    assert meta["status"] == "success" and meta["category"] == "Akademik" and meta["session_id"] == "s1"
+    # Newlines and spacing in the answer survive the JSON framing
+    assert "".join(data["text"] for _, data in events[1:-1]) == ANSWER
+
+
+def test_chunks_split_only_at_whitespace(bot):
+    frames = bot.answer_stream(ANSWER)
+    texts = [json.loads(frame.split(b"data: ", 1)[1])["text"] for frame in frames]
+    assert "".join(texts) == ANSWER
+    for text in texts[:-1]:
+        assert len(text) >= server.STREAM_CHUNK_CHARS
+        assert text[-1].isspace()
+    # A word longer than the chunk size is sent whole
+    assert any("https://elista.unja.ac.id/mahasiswa/bimbingan/agenda/rekap-semua-semester" in t for t in texts)
+
+
+def test_frames_are_cached_per_message(bot):
+    assert bot.answer_stream(ANSWER) is bot.answer_stream(ANSWER)
+
+
+def test_short_messages_are_one_chunk(bot):
+    assert bot.answer_stream("singkat") == [b'event: chunk\ndata: {"text":"singkat"}\n\n']
+    assert bot.answer_stream("") == []
+
+
+def test_invalid_request_is_plain_json(bot):
+    response = server.app.test_client().post('/api/chat/stream', json={"message": "  "})
+    assert response.status_code == 400
+    assert response.mimetype == 'application/json'
@@ -0,0 +1,89 @@
+import pytest
+
+import server
+from server import DegradationLadder
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, 'monotonic', clock)
+    return clock
+
+
+def make_ladder(**kwargs):
+    options = dict(latency_slo_ms=300, queue_depth=4, recovery_seconds=5)
+    options.update(kwargs)
+    return DegradationLadder(**options)
+
+
+def test_idle_ladder_serves_full(clock):
+    ladder = make_ladder()
+    assert ladder.tier(0) == "full"
+    assert ladder.transitions == 0
+
+
+def test_disabled_ladder_ignores_load(clock):
+    ladder = make_ladder(enabled=False)
+    ladder.observe(5000)
+    assert ladder.tier(100) == "full"
+
+
+def test_queue_depth_selects_tier(clock):
+    ladder = make_ladder()
+    assert ladder.tier(4) == "semantic"
+    assert ladder.tier(8) == "cached"
+    assert ladder.tier(100) == "lexical"
+
+
+def test_slow_model_steps_down_once_per_interval(clock):
+    ladder = make_ladder()
+    ladder.observe(900)
+    clock.now += DegradationLadder.STEP_INTERVAL
+    assert ladder.tier(0) == "semantic"
+    # Same second: no second step
+    assert ladder.tier(0) == "semantic"
+    clock.now += DegradationLadder.STEP_INTERVAL
+    assert ladder.tier(0) == "cached"
+
+
+def test_recovers_after_latency_pushed_it_to_a_tier_without_the_model(clock):
+    ladder = make_ladder()
+    ladder.observe(900)
+    for _ in range(5):
+        clock.now += DegradationLadder.STEP_INTERVAL
+        ladder.tier(0)
+    # cached never observes latency, so the stale average must not keep it going down
+    assert ladder.TIERS[ladder.level] == "cached"
+    assert ladder.latency_ms is None
+
+    clock.now += 5
+    assert ladder.tier(0) == "semantic"
+    clock.now += 5
+    assert ladder.tier(0) == "full"
+
+
+def test_recovery_waits_for_recovery_seconds(clock):
+    ladder = make_ladder()
+    assert ladder.tier(8) == "cached"
+    clock.now += 4
+    assert ladder.tier(0) == "cached"
+    clock.now += 1
+    assert ladder.tier(0) == "semantic"
+
+
+def test_fast_model_lets_it_recover(clock):
+    ladder = make_ladder()
+    assert ladder.tier(4) == "semantic"
+    ladder.observe(50)
+    clock.now += 5
+    assert ladder.tier(0) == "full"
+    assert ladder.stats()["transitions"] == 2
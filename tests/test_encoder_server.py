@@ -0,0 +1,128 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from encoder_server import EncodeBatcher, EncoderServer, RemoteEncoder, recv_frame, send_frame
+
+
+def fake_encode(texts):
+    # Row i is [len(text), first char code, ...] so results can be matched back to their text
+    out = np.zeros((len(texts), 4), dtype=np.float32)
+    for i, text in enumerate(texts):
+        out[i, 0] = len(text)
+        out[i, 1] = ord(text[0]) if text else 0
+    return out
+
+
+@pytest.fixture
+def encoder_socket(tmp_path):
+    path = str(tmp_path / "encoder.sock")
+    server = EncoderServer(path, fake_encode, dim=4, max_wait=0.001, model_profile="fake")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path, server
+    server.shutdown()
+    server.server_close()
+
+
+def test_frames_survive_partial_reads():
+    left, right = socket.socketpair()
+    payloads = [b"", b"x", b"a" * 70000]
+    try:
+        sender = threading.Thread(target=lambda: [send_frame(left, p) for p in payloads])
+        sender.start()
+        received = [recv_frame(right) for _ in payloads]
+        sender.join()
+    finally:
+        left.close()
+        right.close()
+    assert received == payloads
+
+
+def test_recv_frame_raises_on_closed_socket():
+    left, right = socket.socketpair()
+    # Header promises 10 bytes, only 3 arrive
+    left.sendall(b"\x00\x00\x00\x0aabc")
+    left.close()
+    with pytest.raises(ConnectionError):
+        recv_frame(right)
+    right.close()
+
+
+def test_batcher_merges_concurrent_requests_and_splits_results():
+    gate = threading.Event()
+
+    def slow_encode(texts):
+        gate.wait(5)
+        return fake_encode(texts)
+
+    batcher = EncodeBatcher(slow_encode, max_batch=64, max_wait=0.2)
+    texts = [["a"], ["bb", "ccc"], ["dddd"]]
+    results = [None] * len(texts)
+
+    def submit(i):
+        results[i] = batcher.submit(texts[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    for batch, result in zip(texts, results):
+        np.testing.assert_array_equal(result, fake_encode(batch))
+    assert batcher.stats["requests"] == 3
+    assert batcher.stats["texts"] == 4
+    assert batcher.stats["batches"] < 3
+
+
+def test_batcher_propagates_encode_errors():
+    def failing_encode(texts):
+        raise ValueError("boom")
+
+    batcher = EncodeBatcher(failing_encode, max_wait=0.001)
+    with pytest.raises(ValueError, match="boom"):
+        batcher.submit(["a"])
+
+
+def test_remote_encoder_round_trip(encoder_socket):
+    path, _ = encoder_socket
+    encoder = RemoteEncoder([path], timeout=5)
+
+    assert encoder.get_sentence_embedding_dimension() == 4
+    assert encoder.model_profile == "fake"
+    np.testing.assert_array_equal(encoder.encode(["halo", "ukt"]), fake_encode(["halo", "ukt"]))
+    assert encoder.encode([]).shape == (0, 4)
+    assert encoder.stats()["texts"] == 2
+
+
+def test_remote_encoder_reconnects_after_dropped_connection(encoder_socket):
+    path, _ = encoder_socket
+    encoder = RemoteEncoder([path], timeout=5)
+    # Simulate the encoder side closing the cached connection
+    encoder._local.sock.close()
+    encoder._local.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    np.testing.assert_array_equal(encoder.encode(["wifi"]), fake_encode(["wifi"]))
+
+
+def test_remote_encoder_surfaces_server_errors(tmp_path):
+    path = str(tmp_path / "encoder.sock")
+
+    def failing_encode(texts):
+        raise ValueError("model not loaded")
+
+    server = EncoderServer(path, failing_encode, dim=4, max_wait=0.001)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        encoder = RemoteEncoder([path], timeout=5)
+        with pytest.raises(RuntimeError, match="model not loaded"):
+            encoder.encode(["halo"])
+        # The connection stays usable after an error reply
+        assert encoder.stats()["batches"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import server
+
+
+@pytest.fixture(scope='module')
+def bot():
+    # Built-in dataset, which carries the greeting rows
+    return server.ChatbotUPATIK(load_model=False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Gimana cara reset PW siakad?!", "bagaimana cara reset password siakad"),
+    ("  Halo,   bot!!  ", "halo bot"),
+    ("info UKT univ", "informasi ukt universitas"),
+    ("gk bisa login...", "tidak bisa login"),
+    ("?!", ""),
+    ("   ", ""),
+    (None, ""),
+])
+def test_preprocess_normalization(bot, text, expected):
+    assert bot.preprocess_text(text) == expected
+
+
+@pytest.mark.parametrize("greeting", ["Halo", "hai", "HAI BOT!", "selamat  pagi", "Selamat malam.", "apa kabar",
+                                      "Hello?"])
+def test_greetings_are_answered_from_the_table(bot, greeting):
+    before = bot.counters['fast_path_hits']
+    response = bot.get_response(greeting)
+    assert response["match_type"] == "fast_path"
+    assert response["category"] == "Sapaan"
+    assert response["confidence"] == 1.0
+    assert bot.counters['fast_path_hits'] == before + 1
+
+
+def test_every_greeting_row_has_an_entry(bot):
+    greetings = bot.df[bot.df['kategori'] == "Sapaan"]
+    for row, question in greetings['pertanyaan'].items():
+        assert bot.fast_path[bot.preprocess_text(question)] == row
+
+
+def test_other_questions_miss_the_fast_path(bot):
+    before = bot.counters['fast_path_lookups'], bot.counters['fast_path_hits']
+    assert bot.fast_path_lookup("halo apakah bisa bayar ukt nanti") is None
+    assert (bot.counters['fast_path_lookups'], bot.counters['fast_path_hits']) == (before[0] + 1, before[1])
+
+
+def test_category_hint_limits_fast_path_hits(bot):
+    assert bot.fast_path_lookup("halo", "Sapaan") is not None
+    other = next(c for c in bot.partitions if c != "Sapaan")
+    assert bot.fast_path_lookup("halo", other) is None
+
+
+def test_numbered_questions_match_without_their_number(tmp_path):
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps([
+        {"kategori": "Kepegawaian", "pertanyaan": "9. Saya mengontrak rumah, apakah bisa?", "jawaban": "Bisa."},
+        {"kategori": "Kepegawaian", "pertanyaan": "Saya mengontrak rumah, apakah bisa?", "jawaban": "Ya."},
+    ]))
+    bot = server.ChatbotUPATIK(json_file_path=str(path), load_model=False)
+    assert bot.fast_path["9 saya mengontrak rumah apakah bisa"] == 0
+    # The unnumbered key points at the first row that produced it
+    assert bot.fast_path["saya mengontrak rumah apakah bisa"] == 0
@@ -0,0 +1,93 @@
+import glob
+import gzip
+import os
+import subprocess
+import sys
+import textwrap
+
+from interaction_log import LOG_FILE_PATTERN, InteractionLogger, iter_interactions
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def log_files(directory):
+    return sorted(glob.glob(os.path.join(directory, LOG_FILE_PATTERN)))
+
+
+def test_close_flushes_pending_records(tmp_path):
+    # The batch window is far longer than the test: only close() can get these on disk
+    log = InteractionLogger(str(tmp_path), batch_size=1000, flush_interval=60)
+    for i in range(3):
+        log.log({"query": f"q{i}", "status": "success"})
+    log.close()
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["q0", "q1", "q2"]
+    assert log.stats["written"] == 3 and log.stats["batches"] == 1
+
+
+def test_records_are_flushed_at_interpreter_exit(tmp_path):
+    # server.py registers close() with atexit; a worker exiting mid-batch must not lose its records
+    script = textwrap.dedent(f"""
+        import atexit
+        from interaction_log import InteractionLogger
+        log = InteractionLogger({str(tmp_path)!r}, batch_size=1000, flush_interval=60)
+        atexit.register(log.close)
+        log.log({{"query": "bye", "status": "success"}})
+    """)
+    subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, check=True, timeout=60)
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["bye"]
+
+
+def test_files_rotate_at_the_size_limit(tmp_path):
+    # Every gzip member exceeds 1 byte, so each batch starts a new file
+    log = InteractionLogger(str(tmp_path), max_file_bytes=1, batch_size=1, flush_interval=0)
+    for i in range(4):
+        log.log({"query": f"q{i}"})
+    log.close()
+    files = log_files(str(tmp_path))
+    assert len(files) == 4 == log.stats["files"]
+    assert all(f"-{os.getpid()}-" in os.path.basename(path) for path in files)
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["q0", "q1", "q2", "q3"]
+
+
+def test_batches_share_a_file_below_the_limit(tmp_path):
+    log = InteractionLogger(str(tmp_path), batch_size=1, flush_interval=0)
+    for i in range(4):
+        log.log({"query": f"q{i}"})
+    log.close()
+    assert len(log_files(str(tmp_path))) == 1
+    assert log.stats["batches"] == 4
+
+
+def test_iter_interactions_filters_by_status(tmp_path):
+    log = InteractionLogger(str(tmp_path), flush_interval=0)
+    for status in ("success", "below_threshold", "success", "error"):
+        log.log({"status": status})
+    log.close()
+    assert len(list(iter_interactions(str(tmp_path)))) == 4
+    assert [r["status"] for r in iter_interactions(str(tmp_path), "below_threshold")] == ["below_threshold"]
+    assert len(list(iter_interactions(str(tmp_path), "success"))) == 2
+
+
+def test_truncated_file_keeps_its_complete_batches(tmp_path):
+    path = tmp_path / "interactions-20260101-000000-1-0.jsonl.gz"
+    good = gzip.compress(b'{"query": "ok", "status": "success"}\n')
+    cut = gzip.compress(b'{"query": "lost", "status": "success"}\n')
+    path.write_bytes(good + good + cut[:len(cut) // 2])
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["ok", "ok"]
+
+    # Only the trailer missing: the record itself is complete and still read
+    path.write_bytes(good + cut[:-4])
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["ok", "lost"]
+
+    path.write_bytes(good)
+    assert [r["query"] for r in iter_interactions(str(tmp_path))] == ["ok"]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = InteractionLogger(str(tmp_path), queue_size=1, batch_size=1000, flush_interval=60)
+    # The writer holds the first record while it waits for a batch; the queue then takes one more
+    for i in range(50):
+        log.log({"query": f"q{i}"})
+    assert log.stats["dropped"] > 0
+    log.close()
+    assert log.stats["written"] + log.stats["dropped"] == 50
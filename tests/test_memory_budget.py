@@ -0,0 +1,117 @@
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from memory_budget import RUNTIME_BASELINE_MB, deep_sizeof, plan_memory, sampled_sizeof
+
+DEFAULTS = {"session_memory_mb": 16, "result_cache_size": 4096, "semantic_cache_size": 2048,
+            "history_limit": 10000, "spell_cache_size": 20000}
+
+
+def test_owned_arrays_are_counted_once():
+    array = np.zeros((1000, 100), dtype=np.float32)
+    assert array.nbytes <= deep_sizeof(array) < array.nbytes + 1024
+    assert deep_sizeof([array, array]) == sys.getsizeof([array, array]) + sys.getsizeof(array)
+
+
+def test_views_count_only_their_header():
+    array = np.zeros((1000, 100), dtype=np.float32)
+    assert deep_sizeof(array[:10]) < 1024
+
+
+def test_shared_objects_can_be_excluded():
+    text = "x" * 10000
+    assert deep_sizeof([text]) > 10000
+    assert deep_sizeof([text], exclude={id(text)}) < 1000
+
+
+def test_sampled_sizeof_extrapolates():
+    cache = OrderedDict((i, str(i) * 30) for i in range(1000, 2000))
+    exact = deep_sizeof(cache)
+    assert abs(sampled_sizeof(cache, sample=100) - exact) < 0.05 * exact
+    history = [{"user": str(i) * 20, "confidence": 0.5} for i in range(1000)]
+    assert abs(sampled_sizeof(history, sample=100) - deep_sizeof(history)) < 0.05 * deep_sizeof(history)
+
+
+def test_no_budget_keeps_defaults():
+    plan = plan_memory(0, 470, 100000, 384, 130, DEFAULTS)
+    assert plan["embedding_dtype"] == "float32" and plan["reranker"] and plan["fits"]
+    assert plan["result_cache_size"] == DEFAULTS["result_cache_size"]
+
+
+def test_tight_budget_shrinks_optional_parts():
+    generous = plan_memory(RUNTIME_BASELINE_MB + 470 + 2000, 470, 100000, 384, 130, DEFAULTS)
+    assert generous["embedding_dtype"] == "float32" and generous["reranker"]
+
+    tight = plan_memory(RUNTIME_BASELINE_MB + 470 + 200, 470, 100000, 384, 130, DEFAULTS)
+    # 100k x 384 float32 is ~146 MB, too much of the 200 MB left
+    assert tight["embedding_dtype"] == "float16"
+    assert not tight["reranker"]
+    assert tight["fits"]
+    assert tight["session_memory_mb"] < DEFAULTS["session_memory_mb"] or tight["history_limit"] < DEFAULTS["history_limit"]
+
+    too_small = plan_memory(RUNTIME_BASELINE_MB, 470, 100000, 384, 130, DEFAULTS)
+    assert not too_small["fits"]
+    assert too_small["result_cache_size"] == 64 and too_small["semantic_cache_size"] == 0
+
+
+class FakeEncoder:
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        rng = np.random.default_rng(len(texts))
+        embeddings = rng.normal(size=(len(texts), 8)).astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def budget_env(monkeypatch, tmp_path):
+    import server
+
+    registry = {"lightweight": "big", "models": {
+        "big": {"name": "big", "memory_mb": 2000, "dimension": 8, "threshold": 0.7, "fallback": "small"},
+        "small": {"name": "small", "memory_mb": 50, "dimension": 8, "threshold": 0.7}
+    }}
+    path = tmp_path / "model_registry.json"
+    path.write_text(json.dumps(registry))
+    monkeypatch.setattr(server, 'MODEL_REGISTRY_FILE', str(path))
+    monkeypatch.setattr(server, 'MEMORY_BUDGET_MB', RUNTIME_BASELINE_MB + 300)
+    monkeypatch.setattr(server, 'INDEX_FILE', '')
+    return server
+
+
+def test_plan_charges_the_fallback_that_was_loaded(budget_env, monkeypatch):
+    server = budget_env
+
+    def load(spec, device):
+        if spec["name"] == "big":
+            raise OSError("not downloaded")
+        return FakeEncoder()
+
+    monkeypatch.setattr(server, 'load_sentence_model', load)
+    bot = server.ChatbotUPATIK()
+    assert bot.model_profile == "small"
+    # 2000 MB for the requested profile would not fit in 300 MB; the 50 MB fallback does
+    assert bot.memory_plan["fits"]
+    assert bot.conversation_history.maxlen == bot.memory_plan["history_limit"]
+
+
+def test_plan_charges_no_model_memory_with_encoder_sockets(budget_env, tmp_path):
+    server = budget_env
+    from encoder_server import EncoderServer
+
+    path = str(tmp_path / "encoder.sock")
+    encoder = EncoderServer(path, FakeEncoder().encode, dim=8, max_wait=0.001, model_profile="big")
+    threading.Thread(target=encoder.serve_forever, daemon=True).start()
+    try:
+        bot = server.ChatbotUPATIK(encoder_sockets=[path])
+    finally:
+        encoder.shutdown()
+        encoder.server_close()
+    assert bot.model_profile == "big"
+    assert bot.memory_plan["fits"]
@@ -0,0 +1,51 @@
+import gzip
+import json
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from mine_unanswered import embed_and_fit, summarize_clusters
+
+TOPICS = ["wifi", "ukt", "wisuda"]
+
+
+class TopicEncoder:
+    """One axis per topic word, so every query lands exactly on its topic"""
+
+    def encode(self, texts, batch_size=None):
+        embeddings = np.zeros((len(texts), len(TOPICS)), dtype=np.float32)
+        for i, text in enumerate(texts):
+            embeddings[i, TOPICS.index(text.split()[0])] = 1
+        return embeddings
+
+
+def write_log(path, texts):
+    lines = ''.join(json.dumps({"status": "below_threshold", "processed_query": t}) + '\n' for t in texts)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(lines.encode('utf-8')))
+
+
+def test_second_pass_uses_the_texts_of_the_first(tmp_path):
+    write_log(tmp_path / "interactions-20250101-000000-2-1.jsonl.gz",
+              [f"{topic} query {i}" for i in range(4) for topic in TOPICS])
+    chatbot = TopicEncoder()
+    chatbot.question_embeddings = np.eye(len(TOPICS), dtype=np.float32)
+    chatbot.df = pd.DataFrame({"pertanyaan": TOPICS, "kategori": ["x"] * 3})
+    args = SimpleNamespace(log_dir=str(tmp_path), clusters=3, chunk_size=5, batch_size=8,
+                           examples=3, min_cluster_size=1)
+
+    with tempfile.NamedTemporaryFile(suffix='.f32') as embeddings_file, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as texts_file:
+        kmeans, total = embed_and_fit(chatbot, args, embeddings_file, texts_file)
+        # Another worker appends to an earlier-sorted file between the passes
+        write_log(tmp_path / "interactions-20250101-000000-1-1.jsonl.gz", ["wisuda late"] * 7)
+        embeddings = np.memmap(embeddings_file.name, dtype=np.float32, mode='r', shape=(total, len(TOPICS)))
+        clusters = summarize_clusters(chatbot, args, kmeans, embeddings, texts_file)
+
+    assert total == 12
+    assert sum(c["size"] for c in clusters) == 12
+    for cluster in clusters:
+        topic = cluster["nearest_faq"][0]["question"]
+        assert cluster["examples"] and all(text.startswith(topic) for text in cluster["examples"])
@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+import pytest
+
+import server
+from server import load_model_registry, model_fallback_chain
+
+
+def spec(name, **extra):
+    return {"name": name, "dimension": 8, "threshold": 0.7, **extra}
+
+
+REGISTRY = {"default": "large", "lightweight": "medium", "models": {
+    "large": spec("large", threshold=0.8, fallback="medium"),
+    "medium": spec("medium", threshold=0.75, fallback="small"),
+    "small": spec("small", threshold=0.6)
+}}
+
+
+class FakeEncoder:
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        embeddings = np.ones((len(texts), 8), dtype=np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def registry_file(tmp_path, monkeypatch):
+    def write(registry):
+        path = tmp_path / "model_registry.json"
+        path.write_text(registry if isinstance(registry, str) else json.dumps(registry))
+        monkeypatch.setattr(server, 'MODEL_REGISTRY_FILE', str(path))
+        return path
+
+    monkeypatch.setattr(server, 'INDEX_FILE', '')
+    monkeypatch.setattr(server, 'MODEL_PROFILE', '')
+    return write
+
+
+def test_shipped_registry_is_valid():
+    registry = load_model_registry(server.MODEL_REGISTRY_FILE)
+    for role in ("default", "lightweight"):
+        assert model_fallback_chain(registry, registry[role])[0] == registry[role]
+
+
+def test_profile_missing_fields_is_rejected(tmp_path):
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps({"models": {"broken": {"name": "x"}}}))
+    with pytest.raises(ValueError, match="broken.*dimension.*threshold"):
+        load_model_registry(str(path))
+
+
+def test_fallback_chain_follows_declarations():
+    assert model_fallback_chain(REGISTRY, "large") == ["large", "medium", "small"]
+    assert model_fallback_chain(REGISTRY, "small") == ["small"]
+    assert model_fallback_chain(REGISTRY, None) == []
+
+
+def test_fallback_chain_stops_at_cycles():
+    registry = {"models": {"a": spec("a", fallback="b"), "b": spec("b", fallback="a")}}
+    assert model_fallback_chain(registry, "a") == ["a", "b"]
+
+
+def test_unknown_fallback_is_an_error():
+    registry = {"models": {"a": spec("a", fallback="gone")}}
+    with pytest.raises(ValueError, match="gone"):
+        model_fallback_chain(registry, "a")
+
+
+def test_first_loadable_fallback_is_served(registry_file, monkeypatch):
+    registry_file(REGISTRY)
+    attempts = []
+
+    def load(spec, device):
+        attempts.append(spec["name"])
+        if spec["name"] != "small":
+            raise OSError("not downloaded")
+        return FakeEncoder()
+
+    monkeypatch.setattr(server, 'load_sentence_model', load)
+    bot = server.ChatbotUPATIK(use_lightweight_model=True)
+    assert attempts == ["medium", "small"]
+    assert bot.model_profile == "small"
+    # The threshold belongs to the embedding space of the model actually loaded
+    assert bot.threshold == 0.6
+    assert bot.runtime_config["model_requested"] == "medium"
+
+
+def test_chatbot_model_env_overrides_the_role(registry_file, monkeypatch):
+    registry_file(REGISTRY)
+    monkeypatch.setattr(server, 'MODEL_PROFILE', 'small')
+    monkeypatch.setattr(server, 'load_sentence_model', lambda spec, device: FakeEncoder())
+    assert server.ChatbotUPATIK().model_profile == "small"
+
+
+def test_unknown_chatbot_model_keeps_the_role_default(registry_file, monkeypatch):
+    registry_file(REGISTRY)
+    monkeypatch.setattr(server, 'MODEL_PROFILE', 'nope')
+    monkeypatch.setattr(server, 'load_sentence_model', lambda spec, device: FakeEncoder())
+    assert server.ChatbotUPATIK(use_lightweight_model=False).model_profile == "large"
+
+
+def test_no_loadable_profile_falls_back_to_lexical_matching(registry_file, monkeypatch):
+    registry_file(REGISTRY)
+
+    def load(spec, device):
+        raise OSError("not downloaded")
+
+    monkeypatch.setattr(server, 'load_sentence_model', load)
+    bot = server.ChatbotUPATIK()
+    assert bot.model is None
+    assert bot.get_response("cara reset password siakad")["status"] in ("success", "below_threshold")
+
+
+@pytest.mark.parametrize("content", ["{not json", json.dumps({"models": {"x": {"name": "x"}}})])
+def test_unusable_registry_serves_without_a_model(registry_file, content):
+    registry_file(content)
+    bot = server.ChatbotUPATIK()
+    assert bot.model is None
+    assert bot.model_registry == {"models": {}}
+    assert bot.threshold == server.DEFAULT_THRESHOLD
+
+
+def test_relative_path_and_dimension_are_checked(registry_file, monkeypatch, tmp_path):
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    registry_file(REGISTRY)
+    (tmp_path / "models" / "small").mkdir(parents=True)
+    loaded = []
+
+    class FakeSentenceTransformer(FakeEncoder):
+        def __init__(self, path, **kwargs):
+            loaded.append(path)
+
+        def eval(self):
+            return self
+
+    monkeypatch.setattr(sentence_transformers, 'SentenceTransformer', FakeSentenceTransformer)
+
+    server.load_sentence_model(spec("small", path="models/small"), 'cpu')
+    assert loaded == [str(tmp_path / "models" / "small")]
+
+    with pytest.raises(ValueError, match="8-d embeddings, registry says 384"):
+        server.load_sentence_model(spec("small", path="models/small", dimension=384), 'cpu')
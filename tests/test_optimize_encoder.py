@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import server
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+WORDS = ["cara", "reset", "password", "siakad", "contoh", "pertanyaan", "untuk", "tracing", "warmup", "bayar", "ukt"]
+
+
+@pytest.fixture(scope='module')
+def tiny_model_dir(tmp_path_factory):
+    """A randomly initialized 1-layer BERT saved locally, loadable without the network"""
+    path = tmp_path_factory.mktemp("tiny-bert")
+    vocab = path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n", encoding="utf-8")
+    transformers.BertTokenizerFast(vocab_file=str(vocab)).save_pretrained(str(path))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(vocab_size=5 + len(WORDS), hidden_size=32, num_hidden_layers=1,
+                                     num_attention_heads=2, intermediate_size=64, max_position_embeddings=64)
+    transformers.BertModel(config).save_pretrained(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def bot(tiny_model_dir):
+    chatbot = server.ChatbotUPATIK(load_model=False)
+    chatbot.model = sentence_transformers.SentenceTransformer(tiny_model_dir, device='cpu')
+    chatbot._inference_mode = torch.inference_mode
+    return chatbot
+
+
+def eager_module(bot):
+    transformer = bot.model[0]
+    return transformer._modules[server.transformer_submodule(transformer)]
+
+
+def test_trace_replaces_the_module_encode_calls(bot):
+    eager = eager_module(bot)
+    expected = bot.encode(["cara reset password"])
+
+    bot.optimize_encoder('trace')
+
+    assert bot.runtime_config["encoder_compile"] == "trace"
+    optimized = eager_module(bot)
+    assert optimized is not eager
+    with server.counting_forward(optimized) as calls, server.counting_forward(eager) as eager_calls:
+        embedding = bot.encode(["cara reset password"])
+    assert calls and not eager_calls
+    assert np.allclose(embedding, expected, atol=1e-5)
+
+
+def test_compile_replaces_the_module_encode_calls(bot, monkeypatch):
+    # A pass-through "compiler" keeps the test fast; what matters is which module forward() calls
+    compiled = []
+
+    class Compiled(torch.nn.Module):
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+            self.config = module.config
+
+        def forward(self, *args, **kwargs):
+            return self.module(*args, **kwargs)
+
+    def fake_compile(module, **kwargs):
+        compiled.append(Compiled(module))
+        return compiled[-1]
+
+    monkeypatch.setattr(torch, 'compile', fake_compile)
+    bot.optimize_encoder('compile')
+
+    assert bot.runtime_config["encoder_compile"] == "compile"
+    assert eager_module(bot) is compiled[0]
+    with server.counting_forward(compiled[0]) as calls:
+        bot.encode(["bayar ukt"])
+    assert calls
+
+
+def test_failed_warmup_restores_the_eager_module(bot, monkeypatch):
+    eager = eager_module(bot)
+
+    class Broken(torch.nn.Module):
+        def forward(self, *args, **kwargs):
+            raise RuntimeError("compiled graph failed")
+
+    monkeypatch.setattr(torch, 'compile', lambda module, **kwargs: Broken())
+    bot.optimize_encoder('compile')
+
+    assert eager_module(bot) is eager
+    assert bot.runtime_config["encoder_compile"] == "none"
+    assert bot.encode(["bayar ukt"]).shape == (1, 32)
@@ -0,0 +1,105 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limit import ConcurrencyLimiter, MemoryBucketStore, TokenBucketLimiter
+
+
+def test_burst_then_rate():
+    store = MemoryBucketStore()
+    assert [store.take("ip", 2, 3, 100.0)[0] for _ in range(4)] == [True, True, True, False]
+    # 2 tokens per second: one is back after half a second
+    allowed, retry_after = store.take("ip", 2, 3, 100.25)
+    assert not allowed
+    assert retry_after == pytest.approx(0.25)
+    assert store.take("ip", 2, 3, 100.5)[0]
+
+
+def test_tokens_never_exceed_burst():
+    store = MemoryBucketStore()
+    store.take("ip", 1, 2, 0.0)
+    assert [store.take("ip", 1, 2, 1000.0)[0] for _ in range(3)] == [True, True, False]
+
+
+def test_clients_have_separate_buckets():
+    store = MemoryBucketStore()
+    assert store.take("a", 1, 1, 0.0)[0]
+    assert not store.take("a", 1, 1, 0.0)[0]
+    assert store.take("b", 1, 1, 0.0)[0]
+    assert len(store) == 2
+
+
+def test_least_recently_seen_clients_are_forgotten():
+    store = MemoryBucketStore(stripes=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        store.take(key, 1, 1, 0.0)
+    assert len(store) == 2
+    # a was evicted, so it starts again with a full bucket
+    assert store.take("a", 1, 1, 0.0)[0]
+
+
+def test_limiter_fails_open_when_the_store_breaks():
+    class BrokenStore:
+        backend = "broken"
+
+        def take(self, key, rate, burst, now):
+            raise ConnectionError("store down")
+
+    limiter = TokenBucketLimiter(rate=1, burst=1, store=BrokenStore())
+    assert limiter.acquire("ip") == (True, 0.0)
+
+
+def test_limiter_uses_rate_and_burst():
+    limiter = TokenBucketLimiter(rate=0.001, burst=2)
+    assert [limiter.acquire("ip")[0] for _ in range(3)] == [True, True, False]
+
+
+def test_concurrency_limiter_rejects_after_waiting():
+    slots = ConcurrencyLimiter(1, max_wait=0.01)
+    assert slots.acquire()
+    assert not slots.acquire()
+    assert (slots.in_flight, slots.waiting) == (1, 0)
+    slots.release()
+    assert slots.acquire()
+
+
+def test_concurrency_limiter_hands_over_a_released_slot():
+    slots = ConcurrencyLimiter(1, max_wait=5)
+    slots.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(slots.acquire()))
+    waiter.start()
+    slots.release()
+    waiter.join(5)
+    assert results == [True]
+    assert slots.in_flight == 1
+
+
+@pytest.fixture
+def chat_endpoint(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, 'RATE_LIMIT_KEY', 'session')
+    monkeypatch.setattr(server, 'rate_limiter', TokenBucketLimiter(0.001, 2, MemoryBucketStore()))
+    monkeypatch.setattr(server, 'chatbot', SimpleNamespace(count=lambda name: None))
+    monkeypatch.setitem(server.chatbot_status, 'ready', True)
+
+    def post(body, address='10.0.0.1'):
+        with server.app.test_request_context('/api/chat', method='POST', json=body,
+                                             environ_base={'REMOTE_ADDR': address}):
+            parsed, error = server.parse_chat_request()
+            return 200 if error is None else error[1]
+
+    return post
+
+
+def test_session_key_falls_back_to_ip_without_session_id(chat_endpoint):
+    # Each of these would get a fresh server-issued session id, they must still share the IP's bucket
+    assert [chat_endpoint({"message": "halo"}) for _ in range(3)] == [200, 200, 429]
+    assert chat_endpoint({"message": "halo"}, address='10.0.0.2') == 200
+
+
+def test_session_key_uses_the_sent_session_id(chat_endpoint):
+    assert [chat_endpoint({"message": "halo", "session_id": "a"}) for _ in range(3)] == [200, 200, 429]
+    assert chat_endpoint({"message": "halo", "session_id": "b"}) == 200
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import server
+
+
+class FakeReranker:
+    """Scores pairs from a fixed table keyed by the FAQ question"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def predict(self, pairs, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        return np.array([self.scores.get(question, 0.0) for _, question in pairs])
+
+
+@pytest.fixture(scope='module')
+def chatbot():
+    return server.ChatbotUPATIK(load_model=False)
+
+
+@pytest.fixture
+def bot(chatbot):
+    chatbot.row_thresholds = np.full(len(chatbot.df), 0.7, dtype=np.float32)
+    chatbot._rerank_pair_ms = 1.0
+    chatbot._rerank_budget_skips = 0
+    return chatbot
+
+
+def question(bot, idx):
+    return bot.df.iloc[idx]['pertanyaan']
+
+
+def test_reorders_near_ties_by_cross_encoder_score(bot):
+    bot.reranker = FakeReranker({question(bot, 2): 5.0})
+    candidates = [(1, 0.80), (2, 0.78), (3, 0.50)]
+    assert bot.rerank("q", candidates) == [(2, 0.78), (1, 0.80), (3, 0.50)]
+
+
+def test_candidates_below_their_threshold_are_not_promoted(bot):
+    bot.row_thresholds[2] = 0.79
+    bot.reranker = FakeReranker({question(bot, 2): 5.0})
+    candidates = [(1, 0.80), (2, 0.78), (3, 0.76)]
+    reranked = bot.rerank("q", candidates)
+    assert reranked[0] == (1, 0.80)
+    assert reranked[0][1] >= bot.row_thresholds[reranked[0][0]]
+
+
+def test_budget_skip_is_re_probed(bot):
+    bot.reranker = FakeReranker({question(bot, 2): 5.0})
+    bot._rerank_pair_ms = 10 * server.RERANK_BUDGET_MS  # one cold, slow call
+    candidates = [(1, 0.80), (2, 0.78)]
+    for _ in range(bot.RERANK_PROBE_AFTER):
+        assert bot.rerank("q", candidates) == candidates
+    assert bot.reranker.calls == []
+
+    assert bot.rerank("q", candidates)[0] == (2, 0.78)
+    assert bot.reranker.calls == [2]
+    # The probe replaced the stale estimate, so the next query is reranked again
+    assert bot._rerank_pair_ms < server.RERANK_BUDGET_MS / 2
+    bot.rerank("q", candidates)
+    assert bot.reranker.calls == [2, 2]
@@ -0,0 +1,48 @@
+import numpy as np
+
+import server
+from server import SemanticCache
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_duplicate_hits_and_others_miss():
+    cache = SemanticCache(4, 2, threshold=0.95)
+    cache.add(unit(1, 0), None, [(7, 0.9)])
+    assert cache.lookup(unit(1, 0.1), None) == [(7, 0.9)]
+    assert cache.lookup(unit(1, 1), None) is None
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_category_must_match():
+    cache = SemanticCache(4, 2, threshold=0.95)
+    cache.add(unit(1, 0), "Akademik", [(1, 0.9)])
+    cache.add(unit(1, 0), None, [(2, 0.9)])
+    assert cache.lookup(unit(1, 0), "Akademik") == [(1, 0.9)]
+    assert cache.lookup(unit(1, 0), "Keuangan") is None
+
+
+def test_oldest_entry_is_overwritten():
+    cache = SemanticCache(2, 2, threshold=0.95)
+    cache.add(unit(1, 0), None, [(1, 0.9)])
+    cache.add(unit(0, 1), None, [(2, 0.9)])
+    cache.add(unit(1, 1), None, [(3, 0.9)])
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(unit(1, 0), None) is None
+    assert cache.lookup(unit(0, 1), None) == [(2, 0.9)]
+
+
+def test_zero_capacity_is_disabled():
+    cache = SemanticCache(0, 0, threshold=0.95)
+    cache.add(unit(1, 0), None, [(1, 0.9)])
+    assert cache.lookup(unit(1, 0), None) is None
+    assert cache.stats()["lookups"] == 0
+
+
+def test_no_buffer_without_a_model():
+    chatbot = server.ChatbotUPATIK(load_model=False)
+    assert chatbot.semantic_cache.capacity == 0
+    assert chatbot.semantic_cache.embeddings.nbytes == 0
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import server
+from server import SessionStore
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(server.time, 'time', lambda: clock["now"])
+    return clock
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_unknown_session_has_no_context(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=3)
+    assert store.context("missing") is None
+
+
+def test_context_weights_recent_turns_more(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=3)
+    store.add("s", unit(1, 0))
+    store.add("s", unit(0, 1))
+    context = store.context("s")
+    assert np.isclose(np.linalg.norm(context), 1.0)
+    assert context[1] > context[0] > 0
+
+
+def test_only_the_last_turns_are_kept(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=2)
+    for vector in (unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)):
+        store.add("s", vector)
+    assert store.context("s")[0] == 0
+    assert store.bytes == SessionStore.ENTRY_OVERHEAD + 2 * unit(1, 0, 0).nbytes
+
+
+def test_expired_sessions_are_dropped(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=3)
+    store.add("s", unit(1, 0))
+    now["now"] += 61
+    assert store.context("s") is None
+    assert store.stats()["sessions"] == 0
+    assert store.bytes == 0
+    assert store.evictions == 1
+
+
+def test_byte_budget_evicts_least_recently_used(now):
+    entry = SessionStore.ENTRY_OVERHEAD + unit(1, 0).nbytes
+    store = SessionStore(max_bytes=2 * entry, ttl=60, max_turns=3)
+    store.add("a", unit(1, 0))
+    store.add("b", unit(1, 0))
+    store.context("a")  # a is now the most recently used
+    store.add("c", unit(1, 0))
+    assert set(store.sessions) == {"a", "c"}
+    assert store.bytes == 2 * entry
+
+
+def test_clear_one_session_or_all(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=3)
+    store.add("a", unit(1, 0))
+    store.add("b", unit(1, 0))
+    store.clear("a")
+    assert list(store.sessions) == ["b"]
+    store.clear()
+    assert store.stats() == {"sessions": 0, "bytes": 0, "max_bytes": 1 << 20, "evictions": 0}
+
+
+def test_zero_turns_disables_context(now):
+    store = SessionStore(max_bytes=1 << 20, ttl=60, max_turns=0)
+    store.add("s", unit(1, 0))
+    store.add("s", unit(0, 1))
+    assert store.context("s") is None
+    assert store.stats()["sessions"] == 0
+    assert store.bytes == 0
@@ -0,0 +1,75 @@
+from collections import Counter
+
+from spelling import SpellCorrector, load_lexicon, load_wordlist, osa_distance
+
+
+def make_corrector(**kwargs):
+    words = Counter({"password": 30, "siakad": 30, "bayar": 20, "registrasi": 10, "pembayaran": 10,
+                     "wakil": 5, "atau": 50, "masih": 5, "akan": 20})
+    words.update({"kalau": 1, "kasih": 1, "sakit": 1})  # general word list
+    return SpellCorrector(words, {"mhs": "mahasiswa"}, **kwargs)
+
+
+def test_osa_distance():
+    assert osa_distance("siakad", "siakad", 2) == 0
+    assert osa_distance("siakd", "siakad", 2) == 1
+    assert osa_distance("sikaad", "siakad", 2) == 1  # transposition
+    assert osa_distance("abc", "xyzabc", 2) == 3  # capped at max_distance + 1
+
+
+def test_missing_letter_is_completed():
+    corrector = make_corrector()
+    assert corrector.correct("pasword siakd bayr") == ("password siakad bayar", 3)
+
+
+def test_long_tokens_allow_two_edits():
+    corrector = make_corrector()
+    assert corrector.correct_token("registrsi") == "registrasi"
+    assert corrector.correct_token("pembyaarn") == "pembayaran"
+
+
+def test_known_words_are_kept():
+    corrector = make_corrector()
+    assert corrector.correct("terima kasih kalau sakit") == ("terima kasih kalau sakit", 0)
+
+
+def test_short_tokens_are_not_substituted():
+    corrector = make_corrector()
+    # One substitution or an extra letter away from a vocabulary word, but ordinary words themselves
+    assert corrector.correct_token("ikan") == "ikan"
+    assert corrector.correct_token("hamil") == "hamil"
+    assert corrector.correct_token("minta") == "minta"
+
+
+def test_abbreviations_are_expanded():
+    corrector = make_corrector()
+    assert corrector.correct("mhs bayr") == ("mahasiswa bayar", 2)
+    assert corrector.stats["expanded"] == 1
+
+
+def test_short_and_non_alphabetic_tokens_are_skipped():
+    corrector = make_corrector()
+    assert corrector.correct_token("ab") == "ab"
+    assert corrector.correct_token("2024") == "2024"
+
+
+def test_cache_is_bounded():
+    corrector = make_corrector(cache_size=2)
+    for token in ("bayr", "siakd", "paswrd"):
+        corrector.correct_token(token)
+    assert list(corrector.cache) == ["siakd", "paswrd"]
+    corrector.correct_token("siakd")
+    assert corrector.stats["cache_hits"] == 1
+
+
+def test_lexicon_and_wordlist_files(tmp_path):
+    lexicon = tmp_path / "lexicon.txt"
+    lexicon.write_text("# comment\nwisuda\nmatkul=mata kuliah\n", encoding="utf-8")
+    words, abbreviations = load_lexicon(str(lexicon))
+    assert abbreviations == {"matkul": "mata kuliah"}
+    assert words["wisuda"] == words["kuliah"] > 1
+
+    wordlist = tmp_path / "wordlist.txt"
+    wordlist.write_text("# comment\nKalau\nkasih\n", encoding="utf-8")
+    assert load_wordlist(str(wordlist)) == Counter({"kalau": 1, "kasih": 1})
+    assert load_wordlist(str(tmp_path / "missing.txt")) == Counter()
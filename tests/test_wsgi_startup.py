@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports server the way gunicorn does: no __main__ block, only the app object (or factory)
+WSGI_SCRIPT = textwrap.dedent("""
+    import json, sys, time
+    import server
+
+    app = server.create_app() if sys.argv[1] == 'factory' else server.app
+    client = app.test_client()
+    client.get('/health')
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        health = client.get('/health').get_json()
+        if health['chatbot_ready'] or health['chatbot_error']:
+            break
+        time.sleep(0.1)
+    chat = client.post('/api/chat', json={'message': 'halo'})
+    print(json.dumps({'health': health, 'chat_status': chat.status_code}))
+""")
+
+
+@pytest.mark.parametrize("entry", ["app", "factory"])
+def test_wsgi_import_becomes_ready(tmp_path, entry):
+    registry = tmp_path / "model_registry.json"
+    # No model profiles: the chatbot falls back to lexical matching, which keeps startup fast
+    registry.write_text(json.dumps({"models": {}}))
+    env = dict(os.environ,
+               PYTHONPATH=REPO_DIR,
+               HF_HUB_OFFLINE="1",
+               CHATBOT_MODEL_REGISTRY=str(registry),
+               CHATBOT_INTERACTION_LOG_DIR="",
+               CHATBOT_INDEX_FILE="")
+
+    result = subprocess.run([sys.executable, "-c", WSGI_SCRIPT, entry], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    outcome = json.loads(result.stdout.strip().splitlines()[-1])
+    assert outcome["health"]["chatbot_ready"] is True
+    assert outcome["health"]["chatbot_error"] is None
+    assert outcome["chat_status"] == 200